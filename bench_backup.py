@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""
+Search speed of the engines with value backups against plain uct, using a synthetic
+network so that only tree work is timed. With --baseline the engines of an earlier git
+revision are timed instead, eg 476320e^ for the full backups that re-sum every child,
+so that both sides of a change can be compared on the same machine.
+
+usage: python bench_backup.py [nodes] [--baseline rev]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from bench_util import PlaceholderBoard, SyntheticNet, use_revision
+
+
+def engines():
+    """
+    :return: Dict[name, search function], imported from the search package on sys.path and
+             without the engines it doesn't have
+    """
+    import search
+    from search.bellman_backup import Bellman_search
+    found = {name: search.engines.get(name) for name in ('uct', 'dpuct', 'maxuct', 'sota')}
+    found['bellman'] = Bellman_search
+    found.update((name, search.engines.get(name)) for name in ('mpa', 'minimax'))
+    return {name: engine for name, engine in found.items() if engine is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("nodes", nargs='?', type=int, default=20000)
+    parser.add_argument("--baseline", metavar='REV',
+                        help="time the engines of git revision REV")
+    args = parser.parse_args()
+    if args.baseline:
+        use_revision(args.baseline)
+
+    print('{:>8} {:>10} {:>8}'.format('engine', 'nps', 'vs uct'))
+    uct_nps = None
+    for name, engine in engines().items():
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine(PlaceholderBoard(), args.nodes, net=SyntheticNet())
+        nps = args.nodes / (time.time() - start)
+        uct_nps = uct_nps or nps
+        print('{:>8} {:>10.0f} {:>7.2f}x'.format(name, nps, nps / uct_nps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""
+Memory per node for every node class, on synthetic trees. Boards are excluded: the
+tree is built with a placeholder board that copies to itself. With --baseline the node
+classes of an earlier git revision are measured instead, eg b4c2465^ for the nodes
+before __slots__, so that both sides of a change can be compared on the same machine.
+
+usage: python bench_memory.py [nodes] [--baseline rev]
+"""
+import argparse
+import importlib
+import random
+import tracemalloc
+
+from bench_util import PlaceholderBoard, use_revision
+
+BRANCHING = 30
+# (module, class)
+CLASSES = [('search.uct', 'UCTNode'), ('search.uct', 'AdaptNode'),
+           ('search.backups', 'DPUCTNode'), ('search.backups', 'MaxUCTNode'),
+           ('search.asymmetric', 'AsymNode'), ('search.voi', 'VOINode'),
+           ('search.array_tree', 'ArrayNode'), ('search.sota', 'SOTANode'),
+           ('search.srcr', 'SRCRNode'), ('search.uctv', 'UCTVNode'),
+           ('search.minmax_backup', 'MinMaxNode'), ('search.mpa_backup', 'MPANode'),
+           ('search.bellman_backup', 'BellmanNode'), ('search.crazy', 'CRAZYNode'),
+           ('search.brue', 'BRUENode')]
+
+
+def build(nodeclass, nodes, seed=1):
+    """
+    expand breadth first until the tree has the given number of nodes, most of them leaves
+    """
+    rng = random.Random(seed)
+    root = nodeclass(board=PlaceholderBoard())
+    frontier = [root]
+    count = 1
+    while count < nodes:
+        node = frontier.pop(0)
+        node.expand({'m{}'.format(i): rng.random() for i in range(BRANCHING)})
+        count += BRANCHING
+        frontier.extend(node.children.values())
+    return root, count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("nodes", nargs='?', type=int, default=100000)
+    parser.add_argument("--baseline", metavar='REV',
+                        help="measure the node classes of git revision REV")
+    args = parser.parse_args()
+    if args.baseline:
+        use_revision(args.baseline)
+
+    print('{:>12} {:>10}'.format('node', 'bytes/node'))
+    for module, name in CLASSES:
+        nodeclass = getattr(importlib.import_module(module), name, None)
+        if nodeclass is None:  # not in this revision
+            continue
+        tracemalloc.start()
+        root, count = build(nodeclass, args.nodes)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('{:>12} {:>10.0f}'.format(name, size / count))
+        del root
+
+
+if __name__ == "__main__":
+    main()
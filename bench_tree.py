@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+Selection speed of UCTNode against the array tree, on synthetic trees.
+
+usage: python bench_tree.py [nodes ...]
+"""
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from search.uct import UCTNode
+from search.array_tree import ArrayNode
+
+BRANCHING = 30
+SELECTIONS = 2000
+
+
+def build(root, nodes, seed=1):
+    """
+    expand breadth first until the tree has the given number of nodes, backing up a
+    random value from every new leaf so that visits and values vary
+    """
+    rng = random.Random(seed)
+    frontier = [root]
+    count = 1
+    while count < nodes:
+        node = frontier.pop(0)
+        weights = [rng.random() for _ in range(BRANCHING)]
+        total = sum(weights)
+        node.expand(OrderedDict(('m{}'.format(i), w / total) for i, w in enumerate(weights)))
+        count += BRANCHING
+        children = list(node.children.values())
+        for child in children:
+            child.backup(rng.uniform(-1., 1.))
+        frontier.extend(children)
+    return root
+
+
+def uct_descend(root):
+    current = root
+    while current.is_expanded and current.children:
+        current = current.best_child()
+    return current
+
+
+def array_descend(tree):
+    index = 0
+    while tree.is_expanded[index] and tree.num_children[index]:
+        index = tree.best_child(index)
+    return index
+
+
+def rate(descend, root):
+    start = time.time()
+    for _ in range(SELECTIONS):
+        descend(root)
+    return SELECTIONS / (time.time() - start)
+
+
+sizes = [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]
+print('{:>8} {:>12} {:>12} {:>8}'.format('nodes', 'uct sel/s', 'array sel/s', 'speedup'))
+for nodes in sizes:
+    uct = rate(uct_descend, build(UCTNode(), nodes))
+    array = rate(array_descend, build(ArrayNode(), nodes).tree)
+    print('{:>8} {:>12.0f} {:>12.0f} {:>7.2f}x'.format(nodes, uct, array, array / uct))
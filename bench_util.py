@@ -0,0 +1,74 @@
+"""
+Synthetic boards and network for benchmarking the search code without chess or torch.
+"""
+import atexit
+import hashlib
+import io
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from collections import OrderedDict
+from os import path
+
+
+def use_revision(rev):
+    """
+    put the search package of git revision rev ahead of the working tree's on sys.path, to
+    measure the code as it was before a change. Call it before importing search.
+    """
+    archive = subprocess.run(['git', 'archive', rev, 'search'], check=True, stdout=subprocess.PIPE,
+                             cwd=path.dirname(path.abspath(__file__))).stdout
+    directory = tempfile.mkdtemp(prefix='leela-lite-')
+    atexit.register(shutil.rmtree, directory, True)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    sys.path.insert(0, directory)
+
+
+class PlaceholderBoard:
+    """
+    stands in for a LeelaBoard: copies to itself and ignores moves
+    """
+    def copy(self):
+        return self
+
+    def push_uci(self, move):
+        pass
+
+
+class SyntheticNet:
+    """
+    NeuralNet replacement returning random priors over a fixed number of moves
+    """
+    def __init__(self, branching=30, seed=1):
+        self.branching = branching
+        self.rng = random.Random(seed)
+
+    def evaluate(self, board):
+        weights = [self.rng.random() for _ in range(self.branching)]
+        total = sum(weights)
+        return ({'m{}'.format(i): w / total for i, w in enumerate(weights)},
+                self.rng.uniform(-1., 1.))
+
+    def evaluate_batch(self, boards):
+        return [self.evaluate(board) for board in boards]
+
+
+class HashNet:
+    """
+    lcztools network replacement for real boards: priors over the legal moves and a value in
+    [0, 1], derived from a digest of the position, so that every run sees the same evaluations
+    """
+    def evaluate(self, board):
+        fen = board.pc_board.fen()
+        moves = [move.uci() for move in board.pc_board.legal_moves]
+        weights = [hashlib.md5((fen + move).encode()).digest()[0] + 1 for move in moves]
+        total = sum(weights)
+        value = hashlib.md5(fen.encode()).digest()[0] / 255.
+        return OrderedDict((move, w / total) for move, w in zip(moves, weights)), value
+
+    def evaluate_batch(self, boards):
+        return [self.evaluate(board) for board in boards]
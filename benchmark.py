@@ -1,32 +1,201 @@
+#!/usr/bin/python3
+"""
+Search benchmark over every engine and a fixed set of opening, middlegame and endgame
+positions. Each engine runs in its own process, so that its peak memory is its own, and
+each search gets an empty evaluation cache, so that results don't depend on the order of
+the positions. Without weights a deterministic network derived from the position stands
+in for leela, which measures the search code alone. Everything runs on the CPU.
+
+usage: python benchmark.py [-f weights] [-n nodes] [-e engine ...] [-o results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+import traceback
+
 from lcztools import load_network, LeelaBoard
 import search
-import chess
-import chess.pgn
-import sys
-import datetime
+from bench_util import HashNet
+
+# (id, phase, EPD)
+POSITIONS = [
+    ('start', 'opening', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -'),
+    ('sicilian', 'opening', 'rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq -'),
+    ('qgd', 'opening', 'rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq -'),
+    ('kiwipete', 'middlegame', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -'),
+    ('ruy_lopez', 'middlegame', 'r1bq1rk1/2p1bppp/p1np1n2/1p2p3/4P3/1BP2N1P/PP1P1PP1/RNBQR1K1 b - -'),
+    ('iqp', 'middlegame', 'r1bq1rk1/pp2bppp/2n1pn2/3p4/3P4/2NB1N2/PP3PPP/R1BQ1RK1 w - -'),
+    ('rook_ending', 'endgame', '8/5pk1/6p1/R7/5P2/r5P1/6K1/8 w - -'),
+    ('pawn_race', 'endgame', '8/2k5/8/1p6/8/6P1/5K2/8 w - -'),
+    ('kpk', 'endgame', '8/8/4k3/8/8/4K3/4P3/8 w - -'),
+]
+
+MILESTONES = (0.25, 0.5, 1.0)  # fractions of the node limit timed in each search
+
+
+class Milestones(search.InfoReporter):
+    """
+    info callback recording when a search reaches each fraction of its node limit
+    """
+    def __init__(self, nodes):
+        super().__init__(send=None, interval=0)
+        self.targets = [(fraction, max(1, int(nodes * fraction))) for fraction in MILESTONES]
+        self.times = {}
+
+    def __call__(self, root, leaf):
+        super().__call__(root, leaf)
+        for fraction, target in self.targets:
+            if self.playouts == target:
+                self.times[fraction] = time.time() - self.started
+
 
-weights = sys.argv[1]
+def percentile(values, p):
+    """
+    :return: the p-th percentile of values, nearest rank
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100. * len(values))) - 1))]
 
-board = LeelaBoard()
 
-net = load_network(backend='pytorch_cuda', filename=weights, policy_softmax_temp=2.2)
-nn = search.NeuralNet(net=net, lru_size=5000)
-NODES = 10000
+def bench_engine(name, net, args):
+    """
+    :return: dict of the engine's results over all positions
+    """
+    counters = search.instrument.enable() if args.instrument else None
+    searches = []
+    hits = misses = total_nodes = 0
+    elapsed = 0.
+    for position, phase, epd in POSITIONS:
+        board = LeelaBoard(fen=epd + ' 0 1')
+        for repeat in range(args.repeat):
+            random.seed(repeat)  # for the engines that sample
+            nn = search.NeuralNet(net=net)
+            milestones = Milestones(args.nodes)
+            start = time.time()
+            best, _ = search.engines[name](board, args.nodes, net=nn, batch_size=args.batch_size,
+                                           info=milestones, walk_boards=args.walk_boards)
+            seconds = time.time() - start
+            # root parallel workers evaluate in their own processes, revisits of terminal leaves
+            # skip the evaluator, and brue reports no playouts
+            nodes = milestones.playouts or nn.evaluations
+            # engines that report their playouts only at the end reach the limit when they return
+            milestones.times.setdefault(1.0, seconds)
+            searches.append({'position': position, 'phase': phase, 'best': best,
+                             'seconds': seconds, 'nodes': nodes,
+                             'time_to_nodes': {str(int(args.nodes * f)): milestones.times.get(f)
+                                               for f in MILESTONES}})
+            hits += nn.cache.hits
+            misses += nn.cache.misses
+            total_nodes += nodes
+            elapsed += seconds
+    latencies = [s['seconds'] * 1000. for s in searches]
+    time_to_nodes = {}
+    for f in MILESTONES:
+        times = [s['time_to_nodes'][str(int(args.nodes * f))] for s in searches]
+        times = [t for t in times if t is not None]
+        time_to_nodes[str(int(args.nodes * f))] = sum(times) / len(times) if times else None
+    return {'nps': total_nodes / elapsed if elapsed else 0.,
+            'nodes': total_nodes,
+            'seconds': elapsed,
+            'time_to_nodes': time_to_nodes,
+            'latency_ms': {'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+                           'p99': percentile(latencies, 99), 'max': max(latencies)},
+            'peak_rss_mb': search.peak_rss_mb(),
+            'cache': {'hits': hits, 'misses': misses,
+                      'hit_rate': hits / (hits + misses) if hits + misses else 0.},
+            'instrument': counters.report() if counters is not None else None,
+            'searches': searches}
 
-def do_nn():
-    best, node = search.UCT_search(board, NODES, net=net, C=3.4)
 
-start = datetime.datetime.now()
-do_nn()
-fini = datetime.datetime.now()
+def run_engine(name, net, args, connection):
+    try:
+        result = bench_engine(name, net, args)
+    except Exception as e:
+        # reported, with the other engines' results kept, and the benchmark fails at the end
+        result = {'error': repr(e), 'traceback': traceback.format_exc()}
+    connection.send(result)
+    connection.close()
 
-diff = fini - start
-msecs = diff.microseconds + (diff.seconds*1000000.0)
-nps = round(NODES*1000000.0/(msecs))
 
-print("{} nps".format(nps))
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--weights",
+                        help="a weights file, loaded on the cpu, or a trace to replay. Without it a synthetic "
+                             "network is used")
+    parser.add_argument("-n", "--nodes",
+                        help="the number of nodes per search",
+                        type=int, default=800)
+    parser.add_argument("-e", "--engines", nargs="+",
+                        help="the engines to run, all by default")
+    parser.add_argument("--batch-size",
+                        help="the number of positions to evaluate per network call",
+                        type=int, default=1)
+    parser.add_argument("--repeat",
+                        help="the number of searches of each position",
+                        type=int, default=1)
+    parser.add_argument("--walk-boards",
+                        help="keep a board only at the root, and push and pop moves on it to reach each leaf",
+                        action="store_true")
+    parser.add_argument("--instrument",
+                        help="time the phases of each search, and count leaf depths and branching",
+                        action="store_true")
+    parser.add_argument("--record",
+                        help="a trace file to record the network's evaluations to, for replay with -f")
+    parser.add_argument("-o", "--output",
+                        help="the file to write the results to as JSON",
+                        default="bench_output.json")
+    args = parser.parse_args()
 
+    if search.is_trace(args.weights):
+        net = search.ReplayNet(args.weights)
+    elif args.weights:
+        net = load_network(backend='pytorch_cpu', filename=args.weights, policy_softmax_temp=2.2)
+    else:
+        net = HashNet()
+    if args.record:
+        net = search.RecordingNet(net, args.record)
+    names = args.engines or [name for name, engine in search.engines.items() if callable(engine)]
 
+    results = {'nodes': args.nodes,
+               'batch_size': args.batch_size,
+               'repeat': args.repeat,
+               'walk_boards': args.walk_boards,
+               'weights': args.weights,
+               'python': platform.python_version(),
+               'positions': [{'id': p, 'phase': phase, 'epd': epd} for p, phase, epd in POSITIONS],
+               'engines': {}}
+    print('{:>10} {:>9} {:>9} {:>9} {:>9} {:>8} {:>6}'.format(
+        'engine', 'nps', 'p50 ms', 'p90 ms', 'max ms', 'rss MB', 'hits'))
+    context = multiprocessing.get_context('fork')
+    for name in names:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_engine, args=(name, net, args, sender))
+        process.start()
+        result = receiver.recv()
+        process.join()
+        results['engines'][name] = result
+        if 'error' in result:
+            print('{:>10} {}'.format(name, result['error']))
+            print(result['traceback'], file=sys.stderr)
+            continue
+        print('{:>10} {:>9.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.0f} {:>5.0f}%'.format(
+            name, result['nps'], result['latency_ms']['p50'], result['latency_ms']['p90'],
+            result['latency_ms']['max'], result['peak_rss_mb'], result['cache']['hit_rate'] * 100))
+        if result['instrument'] is not None:
+            print('{:>10} {}'.format('', ' '.join(
+                '{} {:.0f}ms'.format(phase, times['seconds'] * 1000)
+                for phase, times in result['instrument']['phases'].items() if times['calls'])))
 
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    failed = [name for name, result in results['engines'].items() if 'error' in result]
+    if failed:
+        sys.exit('failed: {}'.format(' '.join(failed)))
 
 
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,10 @@ import sys
 sys.path.extend(['/content/lczero_tools/src', '/content/python-chess', '/content/leela-lite'])
 from lcztools import load_network, LeelaBoard
 import search
+import logging
 from os import path
+import threading
+import time
 
 logfile = open("leelalite_uct.log", "w")
 LOG = False
@@ -15,50 +18,162 @@ def log(str):
         logfile.flush()
 
 
+send_lock = threading.Lock()
+
+
 def send(str):
-    log(">{}".format(str))
-    sys.stdout.write(str)
-    sys.stdout.write("\n")
-    sys.stdout.flush()
+    with send_lock:
+        log(">{}".format(str))
+        sys.stdout.write(str)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
 
 
 def process_position(tokens):
-    board = LeelaBoard()
-
-    offset = 0
+    """
+    position [startpos | fen <fen>] moves <move> ...
+    :return: (fen or None for the start position, list of moves)
+    """
+    fen = None
+    offset = 2
 
-    if tokens[1] == 'startpos':
-        offset = 2
-    elif tokens[1] == 'fen':
+    if tokens[1] == 'fen':
         fen = " ".join(tokens[2:8])
-        board = LeelaBoard(fen=fen)
         offset = 8
 
-    if offset >= len(tokens):
-        return board
+    moves = []
+    if offset < len(tokens) and tokens[offset] == 'moves':
+        moves = tokens[offset+1:]
+
+    return fen, moves
+
+
+def extends(position, fen, moves):
+    """
+    :param position: (fen, moves) of an earlier position command
+    :return: the moves played since position, or None if (fen, moves) doesn't follow on from it
+    """
+    old_fen, old_moves = position
+    if old_fen != fen or moves[:len(old_moves)] != old_moves:
+        return None
+    return moves[len(old_moves):]
+
+
+GO_LIMITS = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'nodes')
+
+
+def process_go(tokens):
+    """
+    go [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>] [movestogo <n>] [movetime <ms>] [nodes <n>] [infinite]
+    :return: dict of the limits given
+    """
+    limits = {}
+    i = 1
+    while i < len(tokens):
+        if tokens[i] == 'infinite':
+            limits['infinite'] = True
+        elif tokens[i] in GO_LIMITS and i + 1 < len(tokens):
+            i += 1
+            limits[tokens[i-1]] = int(tokens[i])
+        i += 1
+    return limits
 
-    if tokens[offset] == 'moves':
-        for i in range(offset+1, len(tokens)):
-            board.push_uci(tokens[i])
 
-    return board
+# options that may be set without a value, which means an empty string
+STRING_OPTIONS = ('list of syzygy tablebase directories', 'persistentcache')
+
+
+def process_option(tokens):
+    """
+    setoption name <name> [value <value>]
+    :return: (name, value or None if no value is given)
+    """
+    if 'value' in tokens:
+        i = tokens.index('value')
+        return " ".join(tokens[2:i]), " ".join(tokens[i+1:])
+    return " ".join(tokens[2:]), None
 
 
 if len(sys.argv) != 4:
-    print("Usage: python3 engine.py <policy> <weights file> <nodes>")
+    print("Usage: python3 engine.py <policy> <weights file or server socket> <nodes>")
     print(len(sys.argv))
     exit(1)
 
 policy = sys.argv[1]
 weights = sys.argv[2]
 nodes = int(sys.argv[3])
+batch_size = 1
+hash_mb = 64
+max_nodes = 0  # tree node budget, 0 for none
+multipv_share = 0  # percent of the best move's visits kept on each multipv move
+smart_pruning = False
+workers = 2  # processes of the rootpar engine
+threads = 2  # threads of the threaded engine
+instrument = False  # time the phases of each search, see search.instrument
+walk_boards = False  # keep a board only at the root, see search.board_walk
+time_manager = search.TimeManager()
+
+# search debug output goes to stderr, stdout is the uci stream
+logging.basicConfig(level=logging.WARNING)
+
+if search.remote.is_server(weights):
+    net = search.RemoteNet(weights)
+elif search.is_trace(weights):
+    net = search.ReplayNet(weights)
+else:
+    backend = 'pytorch_cuda' if path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
+    net = load_network(backend=backend, filename=weights, policy_softmax_temp=2.2)
+nn = search.NeuralNet(net=net, lru_size=None, cache_bytes=hash_mb * 1024 * 1024)
+info = search.InfoReporter(send, nn)
+
+
+def run_search(board, position, root, reads, deadline):
+    """
+    search on the worker thread, and send bestmove when done or stopped
+    """
+    global tree
+    counters = search.instrument.enable() if instrument else None
+    budget = search.NodeBudget(max_nodes) if max_nodes else None
+    info.start()
+    best, node = search.engines[policy](board, reads, net=nn, root=root, batch_size=batch_size,
+                                         budget=budget, deadline=deadline, stop=stop,
+                                         info=info, multipv=info.multipv,
+                                         multipv_share=multipv_share / 100.,
+                                         smart_pruning=smart_pruning, workers=workers,
+                                         threads=threads, walk_boards=walk_boards)
+    info.report()
+    if smart_pruning and reads != search.time_manager.UNLIMITED and info.playouts < reads:
+        send("info string smart pruning saved {} playouts".format(reads - info.playouts))
+    if deadline is not None and deadline > time.time():
+        send("info string {:.0f} ms of the move's time unused".format((deadline - time.time()) * 1000))
+    # engines that start from a new tree don't keep the last one
+    tree = (node, (position[0], position[1] + [best])) if search.takes_root(policy) else None
+    if budget is not None:
+        send("info string tree {}".format(budget))
+    send("info string peak rss {:.0f} MB".format(search.peak_rss_mb()))
+    send("info string cache {}".format(nn.cache))
+    if nn.disk_cache:
+        send("info string persistent cache {}".format(nn.disk_cache))
+    if counters is not None:
+        send("info string phases {}".format(counters))
+        send("info string depths {}".format(dict(sorted(counters.depths.items()))))
+    send("bestmove {}".format(best))
+
+
+def wait_search():
+    """
+    let a running search finish before the engine's state changes
+    """
+    if worker is not None:
+        worker.join()
 
-backend = 'pytorch_cuda' if path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
-net = load_network(backend=backend, filename=weights, policy_softmax_temp=2.2)
-nn = search.NeuralNet(net=net)
 
 send("Leela Lite")
+worker = None  # Optional[threading.Thread] running the search
+stop = threading.Event()  # ends the running search
 board = LeelaBoard()
+position = (None, [])  # (fen, moves) of board
+tree = None  # (root, (fen, moves)) kept from the last search
 
 while True:
     line = sys.stdin.readline()
@@ -71,19 +186,117 @@ while True:
         send('id name Leela Lite')
         send('id author Dietrich Kappe')
         send('option name List of Syzygy tablebase directories type string default')
+        send('option name BatchSize type spin default 1 min 1 max 256')
+        send('option name Hash type spin default {} min 1 max 65536'.format(hash_mb))
+        send('option name PersistentCache type string default')
+        send('option name MaxTreeNodes type spin default 0 min 0 max 100000000')
+        send('option name InfoInterval type spin default {:.0f} min 0 max 60000'.format(
+            info.interval * 1000))
+        send('option name MultiPV type spin default 1 min 1 max 500')
+        send('option name MultiPVShare type spin default {} min 0 max 100'.format(multipv_share))
+        send('option name SmartPruning type check default {}'.format(str(smart_pruning).lower()))
+        send('option name Instrument type check default {}'.format(str(instrument).lower()))
+        send('option name WalkBoards type check default {}'.format(str(walk_boards).lower()))
+        send('option name Workers type spin default {} min 1 max 256'.format(workers))
+        send('option name Threads type spin default {} min 1 max 256'.format(threads))
+        send('option name MoveOverhead type spin default {:.0f} min 0 max 10000'.format(
+            time_manager.move_overhead * 1000))
         send('uciok')
     elif tokens[0] == "quit":
+        stop.set()
+        wait_search()
         exit(0)
     elif tokens[0] == "isready":
         send("readyok")
     elif tokens[0] == "ucinewgame":
+        wait_search()
         board = LeelaBoard()
+        position = (None, [])
+        tree = None
+    elif tokens[0] == 'setoption':
+        wait_search()
+        name, value = process_option(tokens)
+        if value is None and name.lower() not in STRING_OPTIONS:
+            send("info string option {} needs a value, ignored".format(name))
+            continue
+        if name.lower() in ('hash', 'persistentcache', 'workers'):
+            # rootpar workers keep the network and caches they were forked with
+            search.root_parallel.close_pool()
+        try:
+            if name.lower() == 'batchsize':
+                batch_size = max(1, int(value))
+            elif name.lower() == 'hash':
+                hash_mb = max(1, int(value))
+                nn.cache.resize(max_bytes=hash_mb * 1024 * 1024)
+            elif name.lower() == 'persistentcache':
+                # only for local weights, the digest of a server's network is unknown
+                if value and not search.remote.is_server(weights):
+                    nn.disk_cache = search.DiskCache(value, search.weights_digest(weights))
+                else:
+                    nn.disk_cache = None
+            elif name.lower() == 'maxtreenodes':
+                max_nodes = max(0, int(value))
+                if max_nodes and not search.takes_budget(policy):
+                    send("info string MaxTreeNodes is not supported by {}, ignored".format(policy))
+                    max_nodes = 0
+            elif name.lower() == 'infointerval':
+                info.interval = max(0, int(value)) / 1000.
+            elif name.lower() == 'multipv':
+                info.multipv = max(1, int(value))
+            elif name.lower() == 'multipvshare':
+                multipv_share = min(100, max(0, int(value)))
+            elif name.lower() == 'smartpruning':
+                smart_pruning = value.lower() == 'true'
+                if smart_pruning and not search.takes_smart_pruning(policy):
+                    send("info string SmartPruning is not supported by {}, ignored".format(policy))
+                    smart_pruning = False
+            elif name.lower() == 'walkboards':
+                walk_boards = value.lower() == 'true'
+            elif name.lower() == 'instrument':
+                instrument = value.lower() == 'true'
+                if not instrument:
+                    search.instrument.disable()
+            elif name.lower() == 'workers':
+                workers = max(1, int(value))
+            elif name.lower() == 'threads':
+                threads = max(1, int(value))
+            elif name.lower() == 'moveoverhead':
+                time_manager.move_overhead = max(0, int(value)) / 1000.
+        except ValueError:
+            send("info string invalid value {} for option {}, ignored".format(value, name))
     elif tokens[0] == 'position':
-        board = process_position(tokens)
+        wait_search()
+        fen, moves = process_position(tokens)
+        new_moves = extends(position, fen, moves)
+        if new_moves is None:
+            board = LeelaBoard(fen=fen) if fen else LeelaBoard()
+            new_moves = moves
+        else:
+            board = board.copy()
+        for move in new_moves:
+            board.push_uci(move)
+        position = (fen, moves)
+
+        if tree is not None:
+            tree_moves = extends(tree[1], fen, moves)
+            root = search.advance_root(tree[0], tree_moves, board) if tree_moves is not None else None
+            tree = (root, position) if root is not None else None
     elif tokens[0] == 'go':
-        best, node = search.engines[policy](board, nodes, net=nn)
-        send("bestmove {}".format(best))
+        wait_search()
+        root = tree[0] if tree is not None and tree[1] == position else None
+        if search.takes_root(policy):
+            send("info string reused {} visits".format(root.number_visits if root is not None else 0))
+        if policy == 'rootpar':
+            # fork the workers here, on the main thread, before the clock starts
+            search.root_parallel.get_pool(nn, workers)
+        reads, deadline = time_manager.search_limits(process_go(tokens), board.pc_board.turn, nodes)
+        stop.clear()
+        worker = threading.Thread(target=run_search, args=(board, position, root, reads, deadline))
+        worker.start()
+    elif tokens[0] == 'stop':
+        stop.set()
+        wait_search()
     else:
-        print('unknown:', tokens)
+        logging.warning('unknown: %s', tokens)
 
 # logfile.close()
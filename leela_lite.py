@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 import argparse
 import chess.pgn
+import logging
 from lcztools import load_network, LeelaBoard
 import os.path
 import search
@@ -11,7 +12,7 @@ default_engine = 'uct'
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-f", "--weights",
-                    help="a path to a weights file")
+                    help="a path to a weights file, the socket of a running nn_server.py, or a trace to replay")
 parser.add_argument("-w", "--white",
                     help="the engine to use for white",
                     choices=search.engines.keys(), default=default_engine)
@@ -21,12 +22,58 @@ parser.add_argument("-b", "--black",
 parser.add_argument("-n", "--nodes",
                     help="the engine to use for black",
                     type=int, default=800)
+parser.add_argument("--batch-size",
+                    help="the number of positions to evaluate per network call",
+                    type=int, default=1)
+parser.add_argument("--workers",
+                    help="the number of processes for the rootpar engine",
+                    type=int, default=2)
+parser.add_argument("--threads",
+                    help="the number of threads for the threaded engine",
+                    type=int, default=2)
+parser.add_argument("--max-nodes",
+                    help="the largest search tree to keep, least visited subtrees are pruned beyond it",
+                    type=int)
+parser.add_argument("--smart-pruning",
+                    help="stop searching once the best move can't change in the remaining nodes",
+                    action="store_true")
+parser.add_argument("--walk-boards",
+                    help="keep a board only at the root, and push and pop moves on it to reach each leaf",
+                    action="store_true")
+parser.add_argument("--persistent-cache",
+                    help="a file to keep network evaluations in between runs")
+parser.add_argument("--record",
+                    help="a trace file to record the network's evaluations to, for replay with -f")
 parser.add_argument("-v", "--verbosity", action="count", default=0)
 args = parser.parse_args()
+unbudgeted = sorted({engine for engine in (args.white, args.black) if not search.takes_budget(engine)})
+if args.max_nodes and unbudgeted:
+    parser.error("--max-nodes is not supported by {}".format(', '.join(unbudgeted)))
+unpruned = sorted({engine for engine in (args.white, args.black) if not search.takes_smart_pruning(engine)})
+if args.smart_pruning and unpruned:
+    parser.error("--smart-pruning is not supported by {}".format(', '.join(unpruned)))
+if args.record and args.persistent_cache:
+    # positions found in the persistent cache never reach the network, so they wouldn't be recorded
+    parser.error("--record can't be combined with --persistent-cache")
 
-backend = 'pytorch_cuda' if os.path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
-net = load_network(backend=backend, filename=args.weights, policy_softmax_temp=2.2)
-nn = search.NeuralNet(net=net)
+# the engines' pv and prediction lines, and their node dumps with -vv
+logging.basicConfig(level=logging.DEBUG if args.verbosity > 1 else logging.INFO, format="%(message)s")
+
+if search.remote.is_server(args.weights):
+    net = search.RemoteNet(args.weights)
+elif search.is_trace(args.weights):
+    net = search.ReplayNet(args.weights)
+else:
+    backend = 'pytorch_cuda' if os.path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
+    net = load_network(backend=backend, filename=args.weights, policy_softmax_temp=2.2)
+if args.record:
+    net = search.RecordingNet(net, args.record)
+disk_cache = None
+if args.persistent_cache and not search.remote.is_server(args.weights):
+    disk_cache = search.DiskCache(args.persistent_cache, search.weights_digest(args.weights))
+nn = search.NeuralNet(net=net, disk_cache=disk_cache)
+# counts the playouts of each search, network calls miss cache hits, terminals and transpositions
+info = search.InfoReporter(print, interval=0)
 board = LeelaBoard()
 
 players = [{'engine': args.white,
@@ -49,21 +96,37 @@ while True:
             print("thinking...")
             if players[turn]['root']:
                 print('starting with', players[turn]['root'].number_visits, 'visits')
-        start = time.time()
         if players[turn]['engine'] != default_engine:
-            search.engines[default_engine](board, args.nodes, net=nn)
+            search.engines[default_engine](board, args.nodes, net=nn, batch_size=args.batch_size)
+        info.start()
         best, node = search.engines[players[turn]['engine']](board, args.nodes,
-                                                             net=nn, root=players[turn]['root'])
+                                                             net=nn, root=players[turn]['root'],
+                                                             info=info,
+                                                             batch_size=args.batch_size,
+                                                             max_nodes=args.max_nodes,
+                                                             smart_pruning=args.smart_pruning,
+                                                             workers=args.workers,
+                                                             threads=args.threads,
+                                                             walk_boards=args.walk_boards)
         print(board.pc_board.fullmove_number, players[turn]['engine'], "best: ", best)
-        elapsed = time.time() - start
+        elapsed = time.time() - info.started
         if args.verbosity:
-            print("Time: {:.3f} nps".format(args.nodes/elapsed))
-        players[turn]['root'] = node
+            print("Time: {:.3f} nps".format(info.playouts / elapsed))
+            if args.smart_pruning:
+                print("Smart pruning saved {} nodes".format(args.nodes - info.playouts))
+            print("Cache:", nn.cache)
+            if nn.disk_cache:
+                print("Persistent cache:", nn.disk_cache)
+            print("Tree: {} nodes kept, peak rss {:.0f} MB".format(search.tree_size(node),
+                                                                  search.peak_rss_mb()))
+        # engines that start from a new tree don't keep the last one
+        players[turn]['root'] = node if search.takes_root(players[turn]['engine']) else None
 
     board.push_uci(best)
-    if players[1-turn]['root'] and best in players[1-turn]['root'].children:
-        players[1 - turn]['root'] = players[1-turn]['root'].children[best]
-    else:
+    # detach the kept roots, so that the previous trees can be freed
+    players[turn]['root'] = search.advance_root(players[turn]['root'], [], board.copy())
+    players[1 - turn]['root'] = search.advance_root(players[1 - turn]['root'], [best], board.copy())
+    if players[1 - turn]['root'] is None:
         if args.verbosity:
             print('tree reset for player', 1-turn, players[1 - turn]['engine'])
         players[1 - turn]['resets'] += 1
@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+import argparse
+import chess
+import chess.pgn
+import logging
+import math
+import multiprocessing
+import os.path
+from lcztools import load_network, LeelaBoard
+import search
+
+"""
+Engine match
+
+Plays two engines against each other over a list of openings, each opening once with
+either colour, on a pool of processes. Finished games are appended to a PGN file, whose
+Round tag is the game's number, so a match that is interrupted is resumed by running it
+again with the same arguments. After every game the running score is printed with its
+Elo difference, and a sequential probability ratio test stops the match once the
+difference is shown to be below elo0 or above elo1.
+"""
+
+game_net = None  # NeuralNet of a worker process
+game_args = None
+
+
+def init_worker(net, args):
+    global game_net, game_args
+    game_net, game_args = search.root_parallel.reconnect(net), args
+
+
+def read_openings(filename):
+    """
+    :return: list of FENs, one per line, skipping blank lines and # comments. None for the start position.
+    """
+    if not filename:
+        return [None]
+    openings = []
+    with open(filename) as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) == 4:  # EPD, without the move counters
+                fields += ['0', '1']
+            openings.append(' '.join(fields[:6]))
+    return openings
+
+
+def game_players(number, args):
+    """
+    :return: (white, black) engine of game number, the first engine is white in odd games
+    """
+    return (args.engine1, args.engine2) if number % 2 else (args.engine2, args.engine1)
+
+
+def play_game(number, fen):
+    """
+    :return: (number, result, pgn) of a finished game
+    """
+    engines = game_players(number, game_args)
+    board = LeelaBoard(fen=fen) if fen else LeelaBoard()
+    roots = [None, None]
+    while not (board.pc_board.is_game_over() or board.is_draw()):
+        turn = 0 if board.pc_board.turn == chess.WHITE else 1
+        best, node = search.engines[engines[turn]](board, game_args.nodes, net=game_net,
+                                                   root=roots[turn],
+                                                   batch_size=game_args.batch_size)
+        board.push_uci(best)
+        # detach the kept roots, so that the previous trees can be freed, and keep trees only for
+        # the engines that search on from them
+        if search.takes_root(engines[turn]):
+            roots[turn] = search.advance_root(node, [], board.copy())
+        roots[1 - turn] = search.advance_root(roots[1 - turn], [best], board.copy())
+    result = board.pc_board.result(claim_draw=True)
+    if result == '*':  # a draw by the leela board's rules only
+        result = '1/2-1/2'
+    game = chess.pgn.Game.from_board(board.pc_board)
+    game.headers['Event'] = '{} vs {}'.format(game_args.engine1, game_args.engine2)
+    game.headers['Round'] = str(number)
+    game.headers['White'], game.headers['Black'] = engines
+    game.headers['Result'] = result
+    return number, result, str(game)
+
+
+def play_task(task):
+    return play_game(*task)
+
+
+def first_engine_score(number, result):
+    """
+    :return: 1, 0.5 or 0, the first engine's score in game number
+    """
+    white = {'1-0': 1., '0-1': 0.}.get(result, 0.5)
+    return white if number % 2 else 1. - white
+
+
+def read_finished(filename):
+    """
+    :return: {game number: result} of the games already in the PGN file
+    """
+    finished = {}
+    if not filename or not os.path.exists(filename):
+        return finished
+    with open(filename) as f:
+        while True:
+            headers = chess.pgn.read_headers(f)
+            if headers is None:
+                break
+            if headers.get('Round', '').isdigit():
+                finished[int(headers['Round'])] = headers['Result']
+    return finished
+
+
+def expected_score(elo):
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def elo_difference(score):
+    score = min(max(score, 1e-6), 1. - 1e-6)
+    return -400. * math.log10(1. / score - 1.)
+
+
+class MatchScore:
+    def __init__(self, elo0=0., elo1=5., alpha=0.05, beta=0.05):
+        """
+        :param elo0: elo difference of the null hypothesis
+        :param elo1: elo difference of the alternative hypothesis
+        :param alpha: probability of accepting elo1 when elo0 holds
+        :param beta: probability of accepting elo0 when elo1 holds
+        """
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        self.wins = self.draws = self.losses = 0
+
+    def add(self, score):
+        if score == 1.:
+            self.wins += 1
+        elif score == 0.:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score_and_variance(self):
+        """
+        :return: mean score per game and its variance per game
+        """
+        games = self.games()
+        score = (self.wins + self.draws / 2.) / games
+        return score, (self.wins + self.draws / 4.) / games - score * score
+
+    def elo(self):
+        """
+        :return: (elo difference, half width of its 95% confidence interval)
+        """
+        score, variance = self.score_and_variance()
+        margin = 1.96 * math.sqrt(variance / self.games())
+        return elo_difference(score), (elo_difference(score + margin) - elo_difference(score - margin)) / 2.
+
+    def llr(self):
+        """
+        :return: log likelihood ratio of elo1 against elo0, in the normal approximation
+        """
+        if not self.games():
+            return 0.
+        score, variance = self.score_and_variance()
+        if variance <= 0.:
+            return 0.
+        s0, s1 = expected_score(self.elo0), expected_score(self.elo1)
+        return (s1 - s0) * (2. * score - s0 - s1) / (2. * variance / self.games())
+
+    def decision(self):
+        """
+        :return: 'H1' once elo1 is accepted, 'H0' once elo0 is accepted, else None
+        """
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    def __str__(self):
+        elo, error = self.elo()
+        return "games {} W {} D {} L {} elo {:+.1f} +- {:.1f} LLR {:.2f} [{:.2f}, {:.2f}]".format(
+            self.games(), self.wins, self.draws, self.losses, elo, error, self.llr(), self.lower, self.upper)
+
+
+def main():
+    # the search engines, not human play, and not rootpar, whose workers a game process can't fork
+    names = [name for name, engine in search.engines.items() if callable(engine) and name != 'rootpar']
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--weights",
+                        help="a path to a weights file, or the socket of a running nn_server.py")
+    parser.add_argument("engine1", choices=names)
+    parser.add_argument("engine2", choices=names)
+    parser.add_argument("-n", "--nodes",
+                        help="the number of nodes per move",
+                        type=int, default=800)
+    parser.add_argument("--batch-size",
+                        help="the number of positions to evaluate per network call",
+                        type=int, default=1)
+    parser.add_argument("--openings",
+                        help="a file of FEN or EPD positions, one per line, each played with both colours")
+    parser.add_argument("--games",
+                        help="the largest number of games, by default two per opening",
+                        type=int)
+    parser.add_argument("--concurrency",
+                        help="the number of games played at once, each in its own process",
+                        type=int, default=2)
+    parser.add_argument("--pgn",
+                        help="the file finished games are appended to, and read back from on resume",
+                        default="match.pgn")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"),
+                        help="stop once the elo difference is shown to be below ELO0 or above ELO1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    openings = read_openings(args.openings)
+    total = args.games or 2 * len(openings)
+    score = MatchScore(*(args.sprt or (0., 5.)), alpha=args.alpha, beta=args.beta)
+    finished = read_finished(args.pgn)
+    for number, result in sorted(finished.items()):
+        score.add(first_engine_score(number, result))
+    if finished:
+        print("resumed", score)
+    if args.sprt and score.decision():
+        print("SPRT", score.decision())
+        return
+
+    # game n plays opening (n - 1) // 2, with colours reversed in every second game
+    pending = [(number, openings[(number - 1) // 2 % len(openings)])
+               for number in range(1, total + 1) if number not in finished]
+    if not pending:
+        return
+
+    if search.remote.is_server(args.weights):
+        net = search.RemoteNet(args.weights)
+    else:
+        backend = 'pytorch_cuda' if os.path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
+        net = load_network(backend=backend, filename=args.weights, policy_softmax_temp=2.2)
+    nn = search.NeuralNet(net=net)
+
+    # forked workers share the loaded network, as in search.root_parallel
+    context = multiprocessing.get_context('fork')
+    pool = context.Pool(max(1, args.concurrency), initializer=init_worker, initargs=(nn, args))
+    try:
+        with open(args.pgn, 'a') as pgn:
+            for number, result, game in pool.imap_unordered(play_task, pending):
+                pgn.write(game + "\n\n")
+                pgn.flush()
+                score.add(first_engine_score(number, result))
+                print("game {} {}: {}".format(number, result, score))
+                if args.sprt and score.decision():
+                    print("SPRT", score.decision())
+                    break
+    finally:
+        # unfinished games are played again on resume
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == '__main__':
+    main()
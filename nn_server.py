@@ -0,0 +1,27 @@
+#!/usr/bin/python3
+import argparse
+import logging
+import os.path
+from lcztools import load_network
+from search.remote import EvalServer
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-f", "--weights",
+                    help="a path to a weights file")
+parser.add_argument("-s", "--socket",
+                    help="the unix socket to listen on",
+                    default="/tmp/leela_lite.sock")
+parser.add_argument("--batch-size",
+                    help="the maximum number of positions per network call",
+                    type=int, default=256)
+parser.add_argument("--max-wait",
+                    help="milliseconds to wait for a batch to fill",
+                    type=float, default=2.)
+args = parser.parse_args()
+
+backend = 'pytorch_cuda' if os.path.exists('/opt/bin/nvidia-smi') else 'pytorch_cpu'
+net = load_network(backend=backend, filename=args.weights, policy_softmax_temp=2.2)
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+print("serving", args.weights, "on", args.socket)
+EvalServer(net, args.socket, max_batch=args.batch_size, max_wait=args.max_wait / 1000.).serve_forever()
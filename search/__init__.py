@@ -1,5 +1,15 @@
 from search.neural_net import NeuralNet
+from search.cache import EvalCache, position_hash
+from search.disk_cache import DiskCache, weights_digest
+from search.remote import RemoteNet
+from search.trace import RecordingNet, ReplayNet, is_trace
+from search.budget import NodeBudget, tree_size
+from search.util import peak_rss_mb
+from search.time_manager import TimeManager
+from search.info import InfoReporter
 from search.uct import UCTNode, AdaptNode
+from search.array_tree import ArrayNode
+from search.dag import DAGNode
 from search.crazy import CRAZY_search
 from search.brue import BRUE_search
 from search.voi import VOINode
@@ -10,14 +20,19 @@ from search.srcr import SRCR_search
 from search.asymmetric import AsymNode
 from search.uctv import UCTV_search
 from search.sota import SOTA_search
+from search.root_parallel import RootParallel_search
 
 from functools import partial
-from search.mcts import mcts_search
+from search.mcts import mcts_search, advance_root
+from search.threaded import threaded_search
 
 # active searches first
 #
 #
 engines = {'uct': partial(mcts_search, UCTNode),
+           'threaded': partial(threaded_search, UCTNode),
+           'array': partial(mcts_search, ArrayNode),
+           'dag': partial(mcts_search, DAGNode),
            'dpuct': partial(mcts_search, DPUCTNode),
            'maxuct': partial(mcts_search, MaxUCTNode),
            'adapt': partial(mcts_search, AdaptNode),
@@ -26,6 +41,8 @@ engines = {'uct': partial(mcts_search, UCTNode),
            'voi': partial(mcts_search, VOINode),
 
            'mpa': MPA_search,
+           'minimax': MinMax_search,
+           'rootpar': RootParallel_search,
            'uctv': UCTV_search,
            'crazy': CRAZY_search,
            'srcr': SRCR_search,
@@ -33,3 +50,28 @@ engines = {'uct': partial(mcts_search, UCTNode),
 
            'human': 'brain'
            }
+
+
+def takes_root(name):
+    """
+    :return: True if engine name searches on from the root it is given, see search.mcts.advance_root,
+             others start from a new tree
+    """
+    engine = engines.get(name)
+    return isinstance(engine, partial) and engine.func in (mcts_search, threaded_search)
+
+
+def takes_budget(name):
+    """
+    :return: True if engine name keeps its tree within max_nodes, see search.budget
+    """
+    engine = engines.get(name)
+    return isinstance(engine, partial) and engine.func in (mcts_search, threaded_search)
+
+
+def takes_smart_pruning(name):
+    """
+    :return: True if engine name stops once its best move is decided, see search.mcts.best_is_decided
+    """
+    engine = engines.get(name)
+    return isinstance(engine, partial) and engine.func in (mcts_search, threaded_search)
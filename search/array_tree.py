@@ -0,0 +1,202 @@
+import math
+import numpy as np
+from search.uct import UCTNode
+from search.board_walk import child_board
+
+"""
+Standard UCT on a structure of arrays tree
+
+Node statistics live in numpy arrays indexed by node number, and the children of a node
+occupy a contiguous slice, so best_child is one vectorised argmax. The search follows
+UCTNode move for move.
+"""
+
+
+class ArrayTree:
+    def __init__(self, board, cpuct=3.4, capacity=1024):
+        self.cpuct = cpuct
+        self.size = 1
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.first_child = np.zeros(capacity, dtype=np.int64)
+        self.num_children = np.zeros(capacity, dtype=np.int64)
+        self.is_expanded = np.zeros(capacity, dtype=bool)
+        self.prior = np.zeros(capacity)
+        self.total_value = np.zeros(capacity)
+        self.reward = np.zeros(capacity)
+        self.number_visits = np.zeros(capacity, dtype=np.int64)
+        self.moves = [None]  # List[move]
+        self.boards = {0: board}  # Dict[index, LeelaBoard], only for evaluated nodes
+        self.terminals = {}  # Dict[index, float], only for terminal nodes
+
+    def grow(self, needed):
+        capacity = len(self.parent)
+        if self.size + needed <= capacity:
+            return
+        capacity = max(2 * capacity, self.size + needed)
+        for name in ('parent', 'first_child', 'num_children', 'is_expanded',
+                     'prior', 'total_value', 'reward', 'number_visits'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        self.parent[self.size:] = -1
+
+    def best_child(self, index):
+        start = self.first_child[index]
+        end = start + self.num_children[index]
+        visits = self.number_visits[start:end] + 1.
+        # same operations in the same order as UCTNode.Q() + cpuct * UCTNode.U(), in place
+        score = self.total_value[start:end] / visits
+        score += self.reward[start:end]
+        u = self.prior[start:end] * math.sqrt(self.number_visits[index])
+        u /= visits
+        u *= self.cpuct
+        score += u
+        return int(start + score.argmax())
+
+    def select_leaf(self, index=0):
+        while self.is_expanded[index] and self.num_children[index]:
+            index = self.best_child(index)
+        if index not in self.boards:
+            board = child_board(self.boards[int(self.parent[index])], self.moves[index])
+            self.boards[index] = board
+        return index
+
+    def expand(self, index, child_priors):
+        self.is_expanded[index] = True
+        count = len(child_priors)
+        self.grow(count)
+        start = self.size
+        end = start + count
+        self.first_child[index] = start
+        self.num_children[index] = count
+        self.parent[start:end] = index
+        self.prior[start:end] = list(child_priors.values())
+        self.moves.extend(child_priors.keys())
+        self.size = end
+
+    def path(self, index):
+        """
+        :return: indices from the node's parent up to the root of the tree
+        """
+        path = []
+        index = self.parent[index]
+        while index >= 0:
+            path.append(index)
+            index = self.parent[index]
+        return path
+
+    def backup(self, index, value_estimate: float):
+        self.reward[index] = -value_estimate
+        self.total_value[index] = self.reward[index]
+        path = self.path(index)
+        if path:
+            # Child nodes are multiplied by -1 because we want max(-opponent eval)
+            turnfactor = np.ones(len(path))
+            turnfactor[1::2] = -1
+            self.number_visits[path] += 1
+            self.total_value[path] += value_estimate * turnfactor
+            self.reward[path] = 0.
+
+    def add_virtual_loss(self, index, virtual_loss=1):
+        path = [index] + self.path(index)
+        self.number_visits[path] += virtual_loss
+        self.total_value[path] -= virtual_loss
+
+
+class ArrayNode(UCTNode):
+    """
+    handle on one node of an ArrayTree, with the UCTNode interface that mcts_search,
+    engine.py and leela_lite.py use
+    """
+    name = 'array'
+    __slots__ = ('tree', 'index')
+    collapse = None  # array slices are never reclaimed, a search over budget stops instead
+    walks_boards = False  # the tree makes a board for every evaluated node
+
+    def __init__(self, board=None, tree=None, index=0, cpuct=3.4):
+        self.tree = tree if tree is not None else ArrayTree(board, cpuct=cpuct)
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def node(self, index):
+        return ArrayNode(tree=self.tree, index=index)
+
+    @property
+    def cpuct(self):
+        return self.tree.cpuct
+
+    @property
+    def board(self):
+        return self.tree.boards.get(self.index)
+
+    @board.setter
+    def board(self, board):
+        self.tree.boards[self.index] = board
+
+    @property
+    def terminal(self):
+        return self.tree.terminals.get(self.index)
+
+    @terminal.setter
+    def terminal(self, value):
+        self.tree.terminals[self.index] = value
+
+    @property
+    def move(self):
+        return self.tree.moves[self.index]
+
+    @property
+    def is_expanded(self):
+        return bool(self.tree.is_expanded[self.index])
+
+    @property
+    def parent(self):
+        parent = self.tree.parent[self.index]
+        return self.node(int(parent)) if parent >= 0 else None
+
+    @parent.setter
+    def parent(self, node):
+        self.tree.parent[self.index] = node.index if node is not None else -1
+
+    @property
+    def children(self):
+        start = int(self.tree.first_child[self.index])
+        end = start + int(self.tree.num_children[self.index])
+        return {self.tree.moves[i]: self.node(i) for i in range(start, end)}
+
+    @property
+    def prior(self):
+        return float(self.tree.prior[self.index])
+
+    @property
+    def total_value(self):
+        return float(self.tree.total_value[self.index])
+
+    @property
+    def number_visits(self):
+        return int(self.tree.number_visits[self.index])
+
+    @property
+    def reward(self):
+        return float(self.tree.reward[self.index])
+
+    def best_child(self):
+        return self.node(self.tree.best_child(self.index))
+
+    def select_leaf(self):
+        return self.node(self.tree.select_leaf(self.index))
+
+    def expand(self, child_priors):
+        self.tree.expand(self.index, child_priors)
+
+    def backup(self, value_estimate: float):
+        self.tree.backup(self.index, value_estimate)
+
+    def add_virtual_loss(self, virtual_loss=1):
+        self.tree.add_virtual_loss(self.index, virtual_loss)
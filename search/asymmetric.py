@@ -1,5 +1,6 @@
 import math
 from search.uct import UCTNode
+from search.board_walk import node_board
 
 """
 Asymmetric Move Selection Strategies in
@@ -10,6 +11,7 @@ Regret at Max Nodes
 
 class AsymNode(UCTNode):
     name = 'asym'
+    __slots__ = ('C_max_sr', 'C_max_cr', 'C_min_sr', 'C_min_cr')
 
     def __init__(self, C_max_sr=3.4, C_max_cr=0., C_min_sr=0., C_min_cr=3.4, **kwargs):
         super(AsymNode, self).__init__(**kwargs)
@@ -46,6 +48,5 @@ class AsymNode(UCTNode):
                 current = current.best_child(self.C_min_sr, self.C_min_cr)  # MIN node, cumulative regret
             depth += 1
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
@@ -2,31 +2,84 @@ from search.uct import UCTNode
 
 
 class DPUCT_mixin:
+    """
+    Each node keeps the weighted sum of its visited children's values, and the most valuable
+    visited child, so a backup only applies the change of the one child on the path.
+    Concrete classes provide the slots: value_sum, weight_sum, contribution, weight,
+    best and best_q.
+    """
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(DPUCT_mixin, self).__init__(**kwargs)
+        self.value_sum = 0.  # sum of backup_weight() * V() over visited children
+        self.weight_sum = 0.  # sum of backup_weight() over visited children
+        self.contribution = 0.  # this node's term in its parent's value_sum
+        self.weight = 0.  # this node's term in its parent's weight_sum
+        self.best = None  # Optional[visited child with the highest Q]
+        self.best_q = 0.
 
     def backup_weight(self):
         return self.prior
 
+    def V(self):
+        return self.best_q if self.best is not None else -self.Q()
+
+    def update_best(self, child):
+        q = child.Q()
+        if child is self.best and q < self.best_q:
+            self.best, self.best_q = None, 0.
+            for n in self.children.values():
+                if n.number_visits and (self.best is None or n.Q() > self.best_q):
+                    self.best, self.best_q = n, n.Q()
+        elif child is self.best or self.best is None or q > self.best_q:
+            self.best, self.best_q = child, q
+
+    def collapse(self):
+        """
+        see UCTNode.collapse: the sums over the dropped children are cleared, so that the value is
+        summed over the new children once the node is expanded again. Without children V() falls
+        back to -Q(), which the ancestors take up.
+        """
+        super(DPUCT_mixin, self).collapse()
+        self.value_sum = 0.
+        self.weight_sum = 0.
+        self.best, self.best_q = None, 0.
+        if self.number_visits:
+            self.update_parents(0)
+
     def backup(self, value_estimate: float):
         current = self
-        current.reward = -value_estimate
+        if not current.number_visits:  # else a collapsed node, see collapse
+            current.reward = -value_estimate
         current.number_visits += 1
+        current.update_parents(1)
+
+    def update_parents(self, visits):
+        """
+        apply the change of this node's value to its ancestors
+        :param visits: visits to add to each ancestor
+        """
+        current = self
         while current.parent is not None:
+            child = current
             current = current.parent
             current.reward = 0
             # print('preupdate Q:', current.Q, len(current.children), current.number_visits)
-            current.number_visits += 1
+            current.number_visits += visits
+            current.update_best(child)
             # do we want to add in this reward? its more stable and will disappear with many evals
-            current.total_value = 0
-            sum_weights = 0
-            for child in [n for n in current.children.values() if n.number_visits]:
-                current.total_value += child.backup_weight() * child.V()
-                sum_weights += child.backup_weight()
-            current.total_value *= current.number_visits / sum_weights
+            weight = child.backup_weight()
+            contribution = weight * child.V()
+            current.value_sum += contribution - child.contribution
+            current.weight_sum += weight - child.weight
+            child.contribution, child.weight = contribution, weight
+            current.total_value = current.value_sum * (current.number_visits / current.weight_sum)
 
 
 class MaxUct_mixin(DPUCT_mixin):
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(MaxUct_mixin, self).__init__(**kwargs)
 
@@ -36,7 +89,9 @@ class MaxUct_mixin(DPUCT_mixin):
 
 class DPUCTNode(DPUCT_mixin, UCTNode):
     name = 'dpuct'
+    __slots__ = ('value_sum', 'weight_sum', 'contribution', 'weight', 'best', 'best_q')
 
 
 class MaxUCTNode(MaxUct_mixin, UCTNode):
     name = 'maxuct'
+    __slots__ = ('value_sum', 'weight_sum', 'contribution', 'weight', 'best', 'best_q')
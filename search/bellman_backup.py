@@ -1,22 +1,37 @@
+import logging
 import numpy as np
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
+from search.playout import run_playouts
+
+
+logger = logging.getLogger(__name__)
 
 
 class BellmanNode:
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'number_visits', 'leaf_visits', 'tree_depth', 'Q', 'reward',
+                 'child_sum', 'contribution')
+
     def __init__(self, board=None, parent=None, move=None, prior=0, depth=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[BellmanNode]
-        self.children = OrderedDict()  # Dict[move, BellmanNode]
+        self.children = NO_CHILDREN  # Dict[move, BellmanNode], allocated by expand
         self.prior = prior  # float
         self.number_visits = 0  # int
         self.leaf_visits = 0  # int
         self.tree_depth = depth
         self.Q = 0
         self.reward = 0
+        # running sum of number_visits * Q over the children, and this node's term
+        # in its parent's sum, so a backup only applies one child's change
+        self.child_sum = 0.
+        self.contribution = 0.
 
     def U(self):  # returns float
         return (math.sqrt(self.parent.number_visits)
@@ -31,12 +46,13 @@ class BellmanNode:
         while current.is_expanded and current.children:
             current = current.best_child(c)
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
@@ -50,46 +66,42 @@ class BellmanNode:
         self.leaf_visits += 1
         self.number_visits += 1
         while current.parent is not None:
+            child = current
             current = current.parent
             # print('preupdate Q:', current.Q, len(current.children), current.number_visits)
             current.number_visits += 1
+            contribution = child.number_visits * child.Q
+            current.child_sum += contribution - child.contribution
+            child.contribution = contribution
             # do we want to add in this reward? its more stable and will disappear with many evals
-            current.Q = current.reward * current.leaf_visits / current.number_visits
-            visits = current.leaf_visits
-            for child in [n for n in current.children.values() if n.number_visits]:
-                current.Q -= child.number_visits * child.Q / current.number_visits
-                visits += child.number_visits
-                # print('updating Q:', current.Q, current.number_visits, visits)
-            # print('postupdate Q:', current.Q, current.number_visits, visits)
+            current.Q = (current.reward * current.leaf_visits - current.child_sum) / current.number_visits
+            # print('postupdate Q:', current.Q, current.number_visits)
 
     def dump(self, move, C):
-        print("---")
-        print("move: ", move)
+        logger.debug("---")
+        logger.debug("move: %s", move)
         # print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q)
-        print("U: ", self.U())
-        print("BestMove: ", self.Q + C * self.U())
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q)
+        logger.debug("U: %s", self.U())
+        logger.debug("BestMove: %s", self.Q + C * self.U())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
 
-def Bellman_search(board, num_reads, net=None, C=1.0):
+def Bellman_search(board, num_reads, net=None, C=1.0, deadline=None, stop=None, info=None,
+                   walk_boards=False, **_):
     assert(net is not None)
     root = BellmanNode(board)
     root.number_visits = 1
-    for _ in range(num_reads):
-        leaf = root.select_leaf(C)
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, lambda: root.select_leaf(C), num_reads, net, deadline, stop, info, walk_boards)
 
     size = min(5, len(root.children))
     pv = heapq.nlargest(size, root.children.items(),
                         key=lambda item: (item[1].number_visits, item[1].Q))
 
-    print('Bellman pv:', [(n[0], n[1].Q, n[1].number_visits) for n in pv])
+    logger.info('Bellman pv: %s', [(n[0], n[1].Q, n[1].number_visits) for n in pv])
     return max(root.children.items(),
                key=lambda item: (item[1].number_visits, item[1].Q))
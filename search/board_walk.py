@@ -0,0 +1,118 @@
+"""
+Board walking
+
+By default a node makes its board from its parent's the first time it is selected, and
+keeps it. A search with walk_boards instead takes the board off the root for its
+duration, so that no node below the root makes one, and walks a single working board
+from leaf to leaf: it pops the moves back to where the next leaf's path leaves the
+current one, and pushes the rest. A tree searched this way holds a single board, at its
+root. Nodes whose board is their key, ie DAGNode and ArrayNode, set walks_boards = False
+and keep their boards. Searches walk inside walking(), which gives the root its board back
+however the search ends, as a kept root without one couldn't be searched again.
+"""
+from contextlib import contextmanager
+
+from search import instrument
+
+
+def child_board(board, move):
+    """
+    :return: a copy of board with move played
+    """
+    counters = instrument.counters
+    tick = counters.now() if counters is not None else 0.
+    board = board.copy()
+    board.push_uci(move)
+    if counters is not None:
+        counters.lap('board', tick)
+    return board
+
+
+def node_board(node):
+    """
+    :return: a new board for node, made from its parent's, or None when the parent has none,
+             as in a search that walks one board
+    """
+    parent = node.parent
+    if parent is None or parent.board is None:
+        return None
+    return child_board(parent.board, node.move)
+
+
+class BoardWalk:
+    def __init__(self, root):
+        """
+        take the root's board for the search, until close, and walk a copy of it
+        """
+        self.root = root
+        self.root_board = root.board
+        self.board = root.board.copy()
+        self.path = []  # moves from the root pushed on the working board
+        root.board = None
+
+    def close(self):
+        self.root.board = self.root_board
+
+    def moves(self, leaf):
+        """
+        :return: the moves from the root to leaf
+        """
+        moves = []
+        while leaf is not self.root:
+            moves.append(leaf.move)
+            leaf = leaf.parent
+        moves.reverse()
+        return moves
+
+    def goto(self, leaf):
+        """
+        bring the working board to leaf's position
+        """
+        counters = instrument.counters
+        tick = counters.now() if counters is not None else 0.
+        moves = self.moves(leaf)
+        common = 0
+        for pushed, move in zip(self.path, moves):
+            if pushed != move:
+                break
+            common += 1
+        for _ in range(len(self.path) - common):
+            self.board.pop()
+        for move in moves[common:]:
+            self.board.push_uci(move)
+        self.path = moves
+        if counters is not None:
+            counters.lap('walk', tick)
+
+    def evaluate(self, net, leaf):
+        """
+        :return: net's evaluation of leaf's position
+        """
+        if leaf.board is not None:  # a board kept from a search that didn't walk
+            return net.evaluate(leaf.board)
+        self.goto(leaf)
+        return net.evaluate(self.board)
+
+    def copy(self, leaf):
+        """
+        :return: a board of leaf's own, for a leaf that is evaluated after the walk has moved on,
+                 eg in a batch
+        """
+        if leaf.board is not None:
+            return leaf.board
+        self.goto(leaf)
+        return self.board.copy()
+
+
+@contextmanager
+def walking(root, walk_boards=True):
+    """
+    :return: context of a BoardWalk of root's tree, None when walk_boards is off or the tree's nodes
+             keep their boards, that closes the walk on exit, including on an exception
+    """
+    walk = BoardWalk(root) if walk_boards and getattr(root, 'walks_boards', True) else None
+    try:
+        yield walk
+    finally:
+        if walk is not None:
+            walk.close()
@@ -1,13 +1,23 @@
+import logging
 from random import choices
-from collections import OrderedDict
+from search.util import NO_CHILDREN
 import math
+import time
+from search.time_manager import out_of_time
+from search.board_walk import child_board
+
+
+logger = logging.getLogger(__name__)
 
 
 class BRUENode:
-    def __init__(self, board, parent=None, prior=0):
-        self.board = board
+    __slots__ = ('board', 'parent', 'move', 'children', 'prior', 'q', 'number_visits', 'uncertainty')
+
+    def __init__(self, board, parent=None, prior=0, move=None):
+        self.board = board  # made when the node is first probed, unless the search walks one board
         self.parent = parent  # Optional[UCTNode]
-        self.children = OrderedDict()  # Dict[move, UCTNode]
+        self.move = move  # str
+        self.children = NO_CHILDREN  # Dict[move, UCTNode], allocated by expand
         self.prior = prior         # float
         self.q = 0.
         self.number_visits = 0     # int
@@ -22,28 +32,24 @@ class BRUENode:
                        [node.prior for node in children.values()], k=1)[0]
     
     def expand(self, child_priors):
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
     def add_child(self, move, prior):
-        child = self.build_child(move)
-        self.children[move] = BRUENode(child, parent=self, prior=prior)
-
-    def build_child(self, move):
-        board = self.board.copy()
-        board.push_uci(move)
-        return board
+        self.children[move] = BRUENode(None, parent=self, prior=prior, move=move)
 
     @staticmethod
     def switch_function(num, _):
         return 1 + num % int(1 + math.log(1 + num))
 
     @staticmethod
-    def end_of_probe(node, net, _):
+    def end_of_probe(node, net, board):
         if node.children:
             return False
-        if not node.board.pc_board.is_game_over():
-            child_priors, value_estimate = net.evaluate(node.board)
+        if not board.pc_board.is_game_over():
+            child_priors, value_estimate = net.evaluate(board)
             node.expand(child_priors)
             node.q = value_estimate
             node.number_visits = 1
@@ -55,10 +61,14 @@ class BRUENode:
 
 
 class Mcts2e:
-    def __init__(self, net):
+    def __init__(self, net, walk_boards=False):
+        """
+        :param walk_boards: push and pop moves on the root's board, rather than keep a board per node
+        """
         self.net = net
+        self.walk_boards = walk_boards
 
-    def probe(self, node, depth, switch):
+    def probe(self, node, depth, switch, board):
         """
         Note that we only want to give a reward based on the terminal state
         as otherwise we over-reward long sequences. In the original MCTS/BRUE
@@ -67,9 +77,10 @@ class Mcts2e:
         :param node:
         :param depth:
         :param switch:
+        :param board: the node's position
         :return:
         """
-        if node.end_of_probe(node, self.net, depth):
+        if node.end_of_probe(node, self.net, board):
             if switch > depth:
                 switch = depth
             reward = node.q
@@ -78,24 +89,35 @@ class Mcts2e:
                 child = node.exploration()
             else:
                 child = node.exploitation()
-            reward = - self.probe(child, depth+1, switch)
-        print('node q:', node.q, 'depth', depth)
+            if self.walk_boards:
+                board.push_uci(child.move)
+                reward = - self.probe(child, depth+1, switch, board)
+                board.pop()
+            else:
+                if child.board is None:
+                    child.board = child_board(board, child.move)
+                reward = - self.probe(child, depth+1, switch, child.board)
+        logger.debug('node q: %s depth %s', node.q, depth)
         if depth == switch:
-            print('update depth', depth, 'reward', reward)
+            logger.debug('update depth %s reward %s', depth, reward)
             node.update_node(reward)
         return reward
 
-    def result(self, root=None, num_reads=0):
+    def result(self, root=None, num_reads=0, deadline=None, stop=None):
         switch = 0
+        board = root.board.copy() if self.walk_boards else root.board
+        start = time.time()
         for n in range(num_reads):
+            if out_of_time(deadline, start, n, stop=stop):
+                break
             switch = root.switch_function(n, switch)
-            self.probe(root, 0, switch)
-            print(sorted([(i[0], i[1].q, i[1].prior, i[1].number_visits) for i in root.children.items()], key=lambda item: -item[1]))
+            self.probe(root, 0, switch, board)
+            logger.debug('%s', sorted([(i[0], i[1].q, i[1].prior, i[1].number_visits) for i in root.children.items()], key=lambda item: -item[1]))
         return max(root.children.items(),
                    key=lambda item: (item[1].q, item[1].number_visits))
 
 
-def BRUE_search(board, num_reads, net=None, **_):
+def BRUE_search(board, num_reads, net=None, deadline=None, stop=None, walk_boards=False, **_):
     root = BRUENode(board)
-    search = Mcts2e(net)
-    return search.result(root, num_reads)
+    search = Mcts2e(net, walk_boards)
+    return search.result(root, num_reads, deadline, stop)
@@ -0,0 +1,100 @@
+"""
+Bounded tree size
+
+A search with a node budget counts the nodes that its expansions add. When the tree
+outgrows the budget, expanded nodes whose children have never been expanded are
+collapsed back into unexpanded leaves, least visited and least likely first. Such a node
+holds little more than its own evaluation, which it keeps, and a later selection
+re-expands it from the evaluation cache. Trees whose nodes can't be collapsed, and trees
+that are still over budget after pruning, stop the search instead. Only the engines for
+which search.takes_budget is True keep to a budget.
+"""
+
+
+def tree_size(root):
+    """
+    :return: the number of nodes under root, counting the unexpanded children of expanded nodes
+    """
+    size = 1
+    seen = set()  # a transposition graph reaches some nodes by several paths
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        children = node.children
+        size += len(children)
+        stack.extend(child for child in children.values() if child.is_expanded)
+    return size
+
+
+def frontier(root):
+    """
+    :return: the expanded nodes under root none of whose children have been expanded
+    """
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in node.children.values():
+            if not child.is_expanded or not child.children:
+                continue
+            if any(n.is_expanded for n in child.children.values()):
+                stack.append(child)
+            else:
+                nodes.append(child)
+    return nodes
+
+
+def prune(root, size, target, keep=()):
+    """
+    collapse frontier nodes until the tree has at most target nodes, or the frontier is used up
+    :param keep: nodes that mustn't be collapsed, eg the parents of leaves being evaluated
+    :return: the new tree size
+    """
+    for node in sorted(frontier(root), key=lambda n: (n.number_visits, n.prior)):
+        if size <= target:
+            break
+        if node in keep:
+            continue
+        size -= len(node.children)
+        node.collapse()
+    return size
+
+
+class NodeBudget:
+    def __init__(self, max_nodes, slack=0.1):
+        """
+        :param max_nodes: the largest tree the search may keep
+        :param slack: fraction of the budget freed by each pruning, so that pruning is occasional
+        """
+        self.root = None
+        self.max_nodes = max_nodes
+        self.target = int(max_nodes * (1 - slack))
+        self.size = 0  # nodes in the tree, kept up to date by the search
+        self.prunings = 0
+
+    def start(self, root):
+        """
+        count the tree a search starts from, which may be kept from the last search
+        """
+        self.root = root
+        self.size = tree_size(root)
+
+    def grow(self, count, keep=()):
+        """
+        account for count new nodes, pruning when the tree has outgrown the budget
+        :param keep: nodes that mustn't be collapsed, see prune
+        :return: False when the tree can't be kept within the budget
+        """
+        self.size += count
+        if self.size <= self.max_nodes:
+            return True
+        if getattr(self.root, 'collapse', None) is not None:
+            self.size = prune(self.root, self.size, self.target, keep)
+            self.prunings += 1
+        return self.size <= self.max_nodes
+
+    def __str__(self):
+        return "{} of {} nodes, {} prunings".format(self.size, self.max_nodes, self.prunings)
@@ -0,0 +1,114 @@
+import sys
+import chess.polyglot
+from collections import OrderedDict
+
+MASK64 = (1 << 64) - 1
+FNV_PRIME = 0x100000001b3
+
+
+def mix(key, value):
+    return ((key ^ value) * FNV_PRIME) & MASK64
+
+
+def position_hash(board, history=7):
+    """
+    64 bit key for the network input: zobrist hash of the position, the moves that
+    led to it (which fix the history planes) and the fifty move counter.
+    Unlike hash(), this is stable between processes.
+    :param board: LeelaBoard
+    :param history: number of previous moves the network sees
+    :return: int
+    """
+    pc_board = board.pc_board
+    key = chess.polyglot.zobrist_hash(pc_board)
+    for move in (pc_board.move_stack[-history:] if history else ()):
+        key = mix(key, move.from_square | move.to_square << 6 | (move.promotion or 0) << 12)
+    return mix(key, pc_board.halfmove_clock)
+
+
+def entry_bytes(result):
+    policy, value = result
+    return (sys.getsizeof(policy) + sys.getsizeof(value) +
+            sum(sys.getsizeof(move) + sys.getsizeof(prior) for move, prior in policy.items()))
+
+
+class EvalCache:
+    """
+    LRU cache of network outputs keyed by position_hash, bounded by entries and/or bytes
+    """
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # Dict[key, (result, bytes)]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, result):
+        size = entry_bytes(result) if self.max_bytes else 0
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (result, size)
+        self.bytes += size
+        self.evict()
+
+    def evict(self):
+        while self.entries and ((self.max_entries and len(self.entries) > self.max_entries) or
+                                (self.max_bytes and self.bytes > self.max_bytes)):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def resize(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if max_bytes:
+            self.bytes = 0
+            for key, (result, _) in self.entries.items():
+                size = entry_bytes(result)
+                self.entries[key] = (result, size)
+                self.bytes += size
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def hashfull(self):
+        """
+        :return: occupancy in permille, as reported by uci
+        """
+        if self.max_bytes:
+            return min(1000, 1000 * self.bytes // self.max_bytes)
+        if self.max_entries:
+            return min(1000, 1000 * len(self.entries) // self.max_entries)
+        return 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hashfull': self.hashfull()}
+
+    def __str__(self):
+        return 'hits {hits} misses {misses} evictions {evictions} entries {entries} hashfull {hashfull}'.format(
+            **self.stats())
@@ -1,19 +1,30 @@
 
+import logging
 import numpy as np
 import math
 from random import choices
 import lcztools
 from lcztools import LeelaBoard
 import chess
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
+from search.playout import run_playouts
+
+
+logger = logging.getLogger(__name__)
 
 
 class CRAZYNode():
-    def __init__(self, board, parent=None, prior=0):
+    __slots__ = ('board', 'is_expanded', 'terminal', 'parent', 'move', 'children', 'prior',
+                 'value', 'Q2', 'number_visits')
+
+    def __init__(self, board, parent=None, prior=0, move=None):
         self.board = board
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[UCTNode]
-        self.children = OrderedDict()  # Dict[move, UCTNode]
+        self.move = move  # str
+        self.children = NO_CHILDREN  # Dict[move, UCTNode], allocated by expand
         self.prior = prior
         if parent is None:
             self.value = 0.  # float
@@ -47,22 +58,19 @@ class CRAZYNode():
         current = self
         while current.is_expanded and current.children:
             current = current.select_child()
+        if not current.board:
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
     def add_child(self, move, prior):
-        child = self.build_child(move)
-        self.children[move] = CRAZYNode(
-            child, parent=self, prior=prior)
-
-    def build_child(self, move):
-        board = self.board.copy()
-        board.push_uci(move)
-        return board
+        self.children[move] = CRAZYNode(None, parent=self, prior=prior, move=move)
     
     def backup(self, reward: float):
         current = self
@@ -70,35 +78,32 @@ class CRAZYNode():
         reward = -reward
         while current is not None:
             current.number_visits += 1
+            # running mean and sum of squared deviations, as in Welford's algorithm
             delta = reward - current.value
-            current.value = delta/current.number_visits
+            current.value += delta/current.number_visits
             delta2 = reward - current.value
             current.Q2 += delta * delta2
             current = current.parent
             reward *= -1
 
     def dump(self, move, C):
-        print("---")
-        print("move: ", move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q())
-        print("U: ", self.U())
-        print("BestMove: ", self.Q() + C * self.U())
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q())
+        logger.debug("U: %s", self.U())
+        logger.debug("BestMove: %s", self.Q() + C * self.U())
         #print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
-def CRAZY_search(board, num_reads, net=None, C=1.0):
+def CRAZY_search(board, num_reads, net=None, C=1.0, deadline=None, stop=None, info=None,
+                 walk_boards=False, **_):
     assert(net != None)
     root = CRAZYNode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf()
-        child_priors, reward, u = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        #reward = .5*(reward+1)
-        leaf.backup(reward)
+    run_playouts(root, root.select_leaf, num_reads, net, deadline, stop, info, walk_boards)
         
     #assert -1<=root.Q()<=1, [c.value for c in root.children.values()]
     #assert 0<=root.U()
@@ -0,0 +1,167 @@
+import logging
+import math
+import heapq
+from search.cache import position_hash
+from search.board_walk import child_board
+
+"""
+Standard UCT on a transposition graph
+
+Positions reached by different move orders share one node, found through a table keyed
+by the position and its fifty move counter. The counter keeps the graph acyclic, since a
+repetition cycle only has reversible moves. A node's value is shared by all of its
+parents, while each edge keeps its own visit count for exploration and move choice.
+Backups follow the path that selection took. A playout that links a new edge to a
+position that has already been evaluated stops there and backs up that position's
+value, so transpositions are not evaluated again. Without transpositions the search is
+the same as UCTNode's. A root kept for the next move gets a table of its own positions,
+so that the table doesn't keep the nodes of earlier moves alive.
+"""
+
+
+logger = logging.getLogger(__name__)
+
+
+class Edge:
+    __slots__ = ('move', 'prior', 'child', 'number_visits')
+
+    def __init__(self, move, prior):
+        self.move = move
+        self.prior = prior  # float
+        self.child = None  # Optional[DAGNode], linked when first selected
+        self.number_visits = 0  # int
+
+
+class DAGNode:
+    name = 'dag'
+    __slots__ = ('cpuct', 'table', 'board', 'is_expanded', 'terminal', 'edges', 'path',
+                 'reward', 'total_value', 'number_visits')
+    walks_boards = False  # a node's board is its key in the table
+
+    def __init__(self, board=None, table=None, cpuct=3.4):
+        self.cpuct = cpuct
+        self.table = table if table is not None else {}  # Dict[hash, DAGNode], shared by the graph
+        self.board = board
+        self.is_expanded = False
+        self.terminal = None  # Optional[float]
+        self.edges = ()  # List[Edge]
+        self.path = ()  # List[(DAGNode, Edge)] from the root, set by select_leaf
+        self.reward = 0
+        self.total_value = 0.  # float
+        self.number_visits = 0  # int
+        if board is not None and not self.table:
+            self.table[position_hash(board, history=0)] = self
+
+    @property
+    def children(self):
+        return {edge.move: edge.child for edge in self.edges if edge.child is not None}
+
+    def Q(self):  # returns float
+        """
+        value of moving to this position, from the pov of any parent
+        """
+        return self.reward + self.total_value / (1 + self.number_visits)
+
+    def edge_Q(self, edge):
+        return edge.child.Q() if edge.child is not None else 0.
+
+    def U(self, edge):  # returns float
+        return math.sqrt(self.number_visits) * edge.prior / (1 + edge.number_visits)
+
+    def best_edge(self):
+        return max(self.edges, key=lambda edge: self.edge_Q(edge) + self.cpuct * self.U(edge))
+
+    def lookup(self, move):
+        """
+        :return: the node for the position after move, shared if it has been reached before
+        """
+        board = child_board(self.board, move)
+        key = position_hash(board, history=0)
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = DAGNode(board=board, table=self.table, cpuct=self.cpuct)
+        return node
+
+    def detach(self):
+        """
+        make this node the root of its own graph, with a table of the positions it reaches, so that
+        the nodes of earlier moves aren't kept alive by the table
+        """
+        table = {}
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            key = position_hash(node.board, history=0)
+            if key in table:
+                continue
+            table[key] = node
+            node.table = table
+            stack.extend(edge.child for edge in node.edges if edge.child is not None)
+        self.path = ()
+
+    def select_leaf(self):
+        current = self
+        path = []
+        while current.is_expanded and current.edges:
+            edge = current.best_edge()
+            path.append((current, edge))
+            if edge.child is None:
+                edge.child = current.lookup(edge.move)
+                if edge.child.is_expanded:
+                    # a transposition into an evaluated position: end the playout there
+                    current = edge.child
+                    break
+            current = edge.child
+        # a leaf reached again before its backup (a collision in a batch) keeps its first path
+        if not current.path:
+            current.path = path
+        return current
+
+    def expand(self, child_priors):
+        if not self.is_expanded:
+            self.is_expanded = True
+            self.edges = [Edge(move, prior) for move, prior in child_priors.items()]
+
+    def backup(self, value_estimate: float):
+        if self.edges:
+            # a transposition leaf: back up the position's current value, not its first evaluation
+            value_estimate = -self.total_value / (1 + self.number_visits)
+        else:
+            self.reward = -value_estimate
+            self.total_value = self.reward
+        # the edge into the leaf is not counted, as UCTNode does not count a leaf's own visit
+        for _, edge in self.path[:-1]:
+            edge.number_visits += 1
+        # Child nodes are multiplied by -1 because we want max(-opponent eval)
+        turnfactor = -1
+        for node, _ in reversed(self.path):
+            node.number_visits += 1
+            turnfactor *= -1
+            node.total_value += (value_estimate * turnfactor)
+            node.reward = 0.
+        self.path = ()
+
+    def add_virtual_loss(self, virtual_loss=1):
+        for node, edge in self.path:
+            edge.number_visits += virtual_loss
+            node.number_visits += virtual_loss
+            node.total_value -= virtual_loss
+        self.number_visits += virtual_loss
+        self.total_value -= virtual_loss
+
+    def revert_virtual_loss(self, virtual_loss=1):
+        self.add_virtual_loss(-virtual_loss)
+
+    def outcome(self):
+        size = min(5, len(self.edges))
+        pv = heapq.nlargest(size, self.edges,
+                            key=lambda edge: (edge.number_visits, self.edge_Q(edge)))
+
+        logger.info('%s pv: %s positions: %s', self.name,
+                    [(edge.move, self.edge_Q(edge), self.U(edge), edge.number_visits) for edge in pv],
+                    len(self.table))
+
+        best = pv[0]
+        if best.child is None:
+            best.child = self.lookup(best.move)
+        return best.move, best.child
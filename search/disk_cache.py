@@ -0,0 +1,143 @@
+"""
+    Persistent evaluation cache shared between runs and processes.
+
+    A fixed size, memory mapped, open addressing table of network outputs. Slots are keyed
+    by the position hash mixed with a digest of the weights file, so one file can be shared
+    by different networks. Each slot holds a checksum of its key and entry, which readers
+    verify on the copy they take, so that an entry torn by concurrent writers, eg the workers
+    of a root parallel search, or read while it is rewritten, is a miss rather than a wrong
+    result.
+"""
+import os
+import hashlib
+import zlib
+from collections import OrderedDict
+
+import chess
+import numpy as np
+
+from search.cache import mix
+
+MAX_MOVES = 64  # positions with more legal moves are not stored
+PROBES = 8
+SLOT = np.dtype([('key', '<u8'),
+                 ('check', '<u4'),  # see checksum
+                 ('value', '<f4'),
+                 ('count', '<u2'),
+                 ('moves', '<u2', (MAX_MOVES,)),
+                 ('priors', '<f4', (MAX_MOVES,))])
+
+
+def weights_digest(filename):
+    """
+    :return: 64 bit digest of the contents of a weights file
+    """
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return int.from_bytes(sha.digest()[:8], 'little')
+
+
+def checksum(slot):
+    """
+    :param slot: array of one SLOT
+    :return: crc32 of the slot, key included, with its check cleared
+    """
+    check = slot['check'][0]
+    slot['check'] = 0
+    value = zlib.crc32(slot.tobytes())
+    slot['check'] = check
+    return value
+
+
+def encode_move(uci):
+    move = chess.Move.from_uci(uci)
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None).uci()
+
+
+class DiskCache:
+    def __init__(self, path, digest, size_mb=128):
+        """
+        :param path: cache file, created if it does not exist
+        :param digest: weights_digest of the network
+        :param size_mb: size of a new cache file, an existing file keeps its size unless it
+                        was written with another slot layout, and is replaced
+        """
+        if os.path.exists(path) and os.path.getsize(path) % SLOT.itemsize == 0:
+            self.table = np.memmap(path, dtype=SLOT, mode='r+')
+        else:
+            slots = max(PROBES, size_mb * 1024 * 1024 // SLOT.itemsize)
+            self.table = np.memmap(path, dtype=SLOT, mode='w+', shape=(slots,))
+        self.path = path
+        self.digest = digest
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def slot_key(self, key):
+        # zero marks an empty slot
+        return mix(key, self.digest) or 1
+
+    def probe(self, key):
+        start = key % len(self.table)
+        for n in range(PROBES):
+            yield (start + n) % len(self.table)
+
+    def get(self, key):
+        key = self.slot_key(key)
+        keys = self.table['key']
+        for i in self.probe(key):
+            if keys[i] == key:
+                slot = self.table[i:i+1].copy()
+                if slot['key'][0] == key and slot['check'][0] == checksum(slot):
+                    self.hits += 1
+                    count = int(slot['count'][0])
+                    policy = OrderedDict(zip(map(decode_move, slot['moves'][0][:count].tolist()),
+                                             slot['priors'][0][:count].tolist()))
+                    return policy, float(slot['value'][0])
+            elif keys[i] == 0:
+                break
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        policy, value = result
+        if len(policy) > MAX_MOVES:
+            return
+        key = self.slot_key(key)
+        keys = self.table['key']
+        target = None
+        for i in self.probe(key):
+            if keys[i] == key or keys[i] == 0:
+                target = i
+                break
+        if target is None:
+            # table is crowded here: replace the first slot on the probe sequence
+            target = key % len(self.table)
+
+        slot = np.zeros(1, dtype=SLOT)
+        slot['key'] = key
+        slot['value'] = value
+        slot['count'] = len(policy)
+        slot['moves'][0][:len(policy)] = [encode_move(move) for move in policy]
+        slot['priors'][0][:len(policy)] = list(policy.values())
+        slot['check'] = checksum(slot)
+
+        self.table[target:target+1] = slot
+        self.stores += 1
+
+    def flush(self):
+        self.table.flush()
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores}
+
+    def __str__(self):
+        return 'hits {hits} misses {misses} stores {stores}'.format(**self.stats())
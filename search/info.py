@@ -0,0 +1,120 @@
+import heapq
+import math
+import time
+
+"""
+UCI info output
+
+The search loops call an InfoReporter once per playout, with the root and the new leaf.
+It keeps the depth of the playouts, and at most once per interval sends an info line for
+each of the multipv best root moves, built from the root's children and their principal
+variations, so the tree is never walked.
+"""
+
+
+def node_value(node):
+    """
+    :return: the node's Q, a method on most node classes and an attribute on some
+    """
+    q = node.Q
+    return q() if callable(q) else q
+
+
+def node_depth(node):
+    """
+    :return: the number of moves from the root to node
+    """
+    path = getattr(node, 'path', None)  # DAGNode keeps the path of its playout
+    if path is not None:
+        return len(path)
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
+
+
+def centipawns(q):
+    """
+    :param q: expected score in [-1, 1]
+    :return: the score in centipawns, on lc0's scale
+    """
+    q = max(-1., min(1., q))
+    return int(round(111.714640912 * math.tan(1.5620688421 * q)))
+
+
+def ranked_moves(root, count):
+    """
+    :return: up to count (move, child) of the root, most visited first, ties broken by Q
+    """
+    return heapq.nlargest(count, root.children.items(),
+                          key=lambda item: (item[1].number_visits, node_value(item[1])))
+
+
+def principal_variation(node, max_length=50):
+    """
+    :return: the moves of the most visited line below node, up to the first unsearched move
+    """
+    pv = []
+    while node.children and len(pv) < max_length:
+        move, child = max(node.children.items(), key=lambda item: item[1].number_visits)
+        if not child.number_visits and not child.is_expanded:
+            break
+        pv.append(move)
+        node = child
+    return pv
+
+
+class InfoReporter:
+    def __init__(self, send, nn=None, interval=1.0, multipv=1):
+        """
+        :param send: function that writes one line to the gui
+        :param nn: optional NeuralNet, for hashfull
+        :param interval: seconds between info lines, 0 for the final line only
+        :param multipv: number of root moves to report a line for
+        """
+        self.send = send
+        self.nn = nn
+        self.interval = interval
+        self.multipv = multipv
+        self.start()
+
+    def start(self):
+        self.started = time.time()
+        self.next = self.started + self.interval
+        self.root = None
+        self.playouts = 0
+        self.depth_sum = 0
+        self.seldepth = 0
+
+    def __call__(self, root, leaf):
+        depth = node_depth(leaf)
+        self.root = root
+        self.playouts += 1
+        self.depth_sum += depth
+        self.seldepth = max(self.seldepth, depth)
+        if self.interval and time.time() >= self.next:
+            self.report()
+            self.next = time.time() + self.interval
+
+    def merge(self, root, playouts, depth_sum, seldepth):
+        """
+        add the playouts of a search made elsewhere, eg by a root parallel worker
+        """
+        self.root = root
+        self.playouts += playouts
+        self.depth_sum += depth_sum
+        self.seldepth = max(self.seldepth, seldepth)
+
+    def report(self):
+        if self.root is None:
+            return
+        elapsed = time.time() - self.started
+        stats = "nodes {} nps {:.0f} time {:.0f}".format(
+            self.playouts, self.playouts / elapsed if elapsed > 0 else 0, elapsed * 1000)
+        if self.nn is not None:
+            stats += " hashfull {}".format(self.nn.cache.hashfull())
+        for rank, (move, child) in enumerate(ranked_moves(self.root, self.multipv), 1):
+            self.send("info depth {} seldepth {} multipv {} score cp {} {} pv {}".format(
+                round(self.depth_sum / self.playouts), self.seldepth, rank,
+                centipawns(node_value(child)), stats, " ".join([move] + principal_variation(child))))
@@ -0,0 +1,82 @@
+"""
+Search instrumentation
+
+When enabled, the search loops time each phase of a playout: selection, making the leaf's
+board, evaluation, with the moves of a walked board and the network call timed on their
+own, expansion, the info callback and backup. They also count the depth of each leaf and the children of each expansion.
+Disabled, which is the default, each phase costs one test of the module's counters.
+Counters are per process, so the workers of root parallel search aren't included.
+"""
+import time
+from collections import Counter
+
+from search.info import node_depth
+
+PHASES = ('select', 'board', 'evaluate', 'walk', 'network', 'expand', 'info', 'backup')
+
+counters = None  # the active Counters, None while instrumentation is off
+
+
+class Counters:
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.depths = Counter()  # leaves by depth below the root
+        self.branching = Counter()  # expansions by number of children
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def lap(self, phase, tick):
+        """
+        add the time since tick to phase
+        :return: the time now, the tick of the next phase
+        """
+        now = time.perf_counter()
+        self.seconds[phase] += now - tick
+        self.calls[phase] += 1
+        return now
+
+    def playout(self, leaf, child_priors):
+        self.depths[node_depth(leaf)] += 1
+        self.branching[len(child_priors)] += 1
+
+    def phases(self):
+        """
+        :return: {phase: (calls, seconds)}, select without the boards it makes and evaluate without
+                 the walked board's moves and the network, ie evaluate is the time of cache hits,
+                 terminal positions and lookups
+        """
+        seconds = dict(self.seconds)
+        seconds['select'] -= seconds['board']
+        seconds['evaluate'] -= seconds['walk'] + seconds['network']
+        return {phase: (self.calls[phase], seconds[phase]) for phase in PHASES}
+
+    def report(self):
+        """
+        :return: the counters as a dict, for json
+        """
+        return {'phases': {phase: {'calls': calls, 'seconds': seconds}
+                           for phase, (calls, seconds) in self.phases().items()},
+                'depths': dict(sorted(self.depths.items())),
+                'branching': dict(sorted(self.branching.items()))}
+
+    def __str__(self):
+        return ' '.join('{} {:.0f}ms/{}'.format(phase, seconds * 1000, calls)
+                        for phase, (calls, seconds) in self.phases().items() if calls)
+
+
+def enable():
+    """
+    start counting, from zero
+    :return: the new Counters
+    """
+    global counters
+    counters = Counters()
+    return counters
+
+
+def disable():
+    global counters
+    counters = None
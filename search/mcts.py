@@ -1,12 +1,181 @@
+import heapq
+import time
+from search import instrument
+from search.board_walk import walking
+from search.budget import NodeBudget
+from search.playout import playout
+from search.terminal import LeafEvaluator
+from search.time_manager import out_of_time, remaining_reads
+from search.uct import UCTNode
 
-def mcts_search(nodeclass, board, num_reads, net=None, root=None):
+
+def advance_root(root, moves, board):
+    """
+    follow moves down from root, and detach the node found so that its ancestors
+    and their other subtrees can be freed
+    :param root: a search root, or None
+    :param moves: list of uci moves played since the root
+    :param board: LeelaBoard after the moves
+    :return: the node for board, or None if the tree doesn't reach it
+    """
+    for move in moves:
+        if root is None or move not in root.children:
+            return None
+        root = root.children[move]
+    if root is not None:
+        if hasattr(root, 'parent'):
+            root.parent = None
+        elif hasattr(root, 'detach'):  # a DAGNode, whose ancestors the position table holds
+            root.detach()
+        if root.board is None:
+            root.board = board
+    return root
+
+
+def multipv_child(root, multipv, share):
+    """
+    :return: the least visited of the root's multipv most visited children, if it has less than
+             share of the most visited child's visits, else None
+    """
+    top = heapq.nlargest(multipv, root.children.values(), key=lambda node: node.number_visits)
+    if len(top) > 1 and top[-1].number_visits < share * top[0].number_visits:
+        return top[-1]
+    return None
+
+
+def select_leaf(root, multipv=1, share=0.):
+    """
+    select from the root, or from a multipv move that is falling behind. Only nodes that back up
+    through their parents, ie UCTNode and its subclasses, can be searched from below the root.
+    """
+    if multipv > 1 and share and root.is_expanded and isinstance(root, UCTNode):
+        child = multipv_child(root, multipv, share)
+        if child is not None:
+            return child.select_leaf()
+    return root.select_leaf()
+
+
+def best_is_decided(root, remaining):
+    """
+    smart pruning
+    :param remaining: playouts left in the search
+    :return: True once no other root move can overtake the most visited one, even with all of
+             the remaining playouts
+    """
+    edges = getattr(root, 'edges', None)  # DAGNode counts visits per edge, and links children lazily
+    if edges is not None:
+        visits = heapq.nlargest(2, [edge.number_visits for edge in edges])
+    else:
+        visits = heapq.nlargest(2, [child.number_visits for child in root.children.values()])
+    if len(visits) < 2:
+        return len(visits) == 1
+    return visits[0] - visits[1] > remaining
+
+
+def mcts_search(nodeclass, board, num_reads, net=None, root=None, batch_size=1, virtual_loss=1,
+                max_nodes=None, budget=None, deadline=None, stop=None, info=None, multipv=1,
+                multipv_share=0., smart_pruning=False, walk_boards=False, **_):
+    """
+    :param max_nodes: optional node budget for the tree, see search.budget
+    :param budget: optional NodeBudget to use instead of max_nodes, eg to read the tree's size afterwards
+    :param deadline: optional time.time() to stop by, see search.time_manager
+    :param stop: optional threading.Event that ends the search when set
+    :param info: optional InfoReporter, called after every expansion
+    :param multipv: number of root moves that multipv_share applies to
+    :param multipv_share: fraction of the best move's visits kept on each of the top multipv moves
+    :param smart_pruning: stop once the best move can't change, see best_is_decided
+    :param walk_boards: keep a board only at the root, see search.board_walk
+    """
     assert(net is not None)
     if not root:
         root = nodeclass(board=board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf()
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
-
+    if budget is None and max_nodes:
+        budget = NodeBudget(max_nodes)
+    if budget is not None:
+        budget.start(root)
+    with walking(root, walk_boards) as walk:
+        evaluate = LeafEvaluator(net, walk)
+        if batch_size > 1:
+            batched_search(root, num_reads, evaluate, batch_size, virtual_loss, budget, deadline, stop,
+                           info, multipv, multipv_share, smart_pruning)
+        else:
+            serial_search(root, num_reads, evaluate, budget, deadline, stop, info, multipv, multipv_share,
+                          smart_pruning)
     return root.outcome()
+
+
+def serial_search(root, num_reads, evaluate, budget=None, deadline=None, stop=None, info=None,
+                  multipv=1, multipv_share=0., smart_pruning=False):
+    start = time.time()
+    for reads in range(num_reads):
+        if out_of_time(deadline, start, reads, stop=stop):
+            break
+        added = playout(root, lambda: select_leaf(root, multipv, multipv_share), evaluate, info)
+        if budget is not None and not budget.grow(added):
+            break
+        if smart_pruning and best_is_decided(root, remaining_reads(num_reads, reads + 1, start, deadline)):
+            break
+
+
+def gather_leaves(root, batch_size, virtual_loss=1, multipv=1, share=0.):
+    """
+    select up to batch_size distinct leaves, applying virtual loss along each path so that
+    successive selections spread across the tree. Gathering stops early on a collision, ie
+    when a leaf already in the batch is selected again, as happens with terminal nodes.
+    :return: list of leaves, each still carrying its virtual loss
+    """
+    leaves = []
+    selected = set()
+    while len(leaves) < batch_size:
+        leaf = select_leaf(root, multipv, share)
+        if leaf in selected:
+            break
+        selected.add(leaf)
+        leaf.add_virtual_loss(virtual_loss)
+        leaves.append(leaf)
+    return leaves
+
+
+def batched_search(root, num_reads, evaluate, batch_size, virtual_loss=1, budget=None, deadline=None,
+                   stop=None, info=None, multipv=1, multipv_share=0., smart_pruning=False):
+    """
+    :param evaluate: the search's LeafEvaluator
+    """
+    start = time.time()
+    reads = 0
+    while reads < num_reads:
+        size = min(batch_size, num_reads - reads)
+        if out_of_time(deadline, start, reads, size, stop):
+            break
+        counters = instrument.counters
+        tick = counters.now() if counters is not None else 0.
+        leaves = gather_leaves(root, size, virtual_loss, multipv, multipv_share)
+        if counters is not None:
+            tick = counters.lap('select', tick)
+        # terminal leaves are resolved by the evaluator without touching the network
+        results = evaluate.batch(leaves)
+        if counters is not None:
+            tick = counters.lap('evaluate', tick)
+        # remove all virtual losses before any backup, as some backups recompute
+        # a node's value from all of its children
+        for leaf in leaves:
+            leaf.revert_virtual_loss(virtual_loss)
+        added = 0
+        for leaf, (child_priors, value_estimate) in zip(leaves, results):
+            added += 0 if leaf.is_expanded else len(child_priors)
+            leaf.expand(child_priors)
+            if counters is not None:
+                tick = counters.lap('expand', tick)
+            if info is not None:
+                info(root, leaf)
+                if counters is not None:
+                    tick = counters.lap('info', tick)
+            leaf.backup(value_estimate)
+            if counters is not None:
+                tick = counters.lap('backup', tick)
+                counters.playout(leaf, child_priors)
+        reads += len(leaves)
+        if budget is not None and not budget.grow(added):
+            break
+        if smart_pruning and best_is_decided(root, remaining_reads(num_reads, reads, start, deadline)):
+            break
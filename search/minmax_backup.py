@@ -1,19 +1,31 @@
+import logging
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
+from search.playout import run_playouts
+
+
+logger = logging.getLogger(__name__)
 
 
 class MinMaxNode:
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'total_value', 'minmax_value', 'number_visits', 'best', 'best_value')
+
     def __init__(self, board=None, parent=None, move=None, prior=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[MinMaxNode]
-        self.children = OrderedDict()  # Dict[move, MinMaxNode]
+        self.children = NO_CHILDREN  # Dict[move, MinMaxNode], allocated by expand
         self.prior = prior  # float
         self.total_value = -parent.Q() if parent else 0.  # float
-        self.minmax_value = -parent.Q() if parent else 0.  # float
+        self.minmax_value = self.total_value  # float
         self.number_visits = 1  # int
+        self.best = None  # Optional[MinMaxNode], the child with the highest minmax_value
+        self.best_value = 0.  # float, its minmax_value when last seen
 
     def Q(self, alpha=0.25):
         return (1 - alpha) * self.total_value / self.number_visits + alpha * self.minmax_value
@@ -32,17 +44,32 @@ class MinMaxNode:
         while current.is_expanded and current.children:
             current = current.best_child(C, alpha)
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
+        if self.children:
+            self.best = max(self.children.values(), key=lambda n: n.minmax_value)
+            self.best_value = self.best.minmax_value
 
     def add_child(self, move, prior):
         self.children[move] = MinMaxNode(parent=self, move=move, prior=prior)
+
+    def update_best(self, child):
+        """
+        account for a change in one child's minmax_value, rescanning the children only
+        when the best child got worse
+        """
+        if child is self.best and child.minmax_value < self.best_value:
+            self.best = max(self.children.values(), key=lambda n: n.minmax_value)
+        elif child is self.best or child.minmax_value > self.best_value:
+            self.best = child
+        self.best_value = self.best.minmax_value
     
     def backup(self, value_estimate: float):
         current = self
@@ -51,48 +78,46 @@ class MinMaxNode:
         current.number_visits += 1
         turnfactor = 1
         while current.parent is not None:
+            child = current
             current = current.parent
             current.number_visits += 1
-            current.minmax_value = -max([n.minmax_value for n in current.children.values()
-                                         if n.number_visits])
+            current.update_best(child)
+            current.minmax_value = -current.best_value
 
             current.total_value += value_estimate * turnfactor
             turnfactor *= -1
         current.number_visits += 1
 
     def dump(self, move, C, alpha):
-        print("---")
-        print("move: ", move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q(alpha))
-        print("U: ", self.U())
-        print("BestMove: ", self.Q(alpha) + C * self.U())
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q(alpha))
+        logger.debug("U: %s", self.U())
+        logger.debug("BestMove: %s", self.Q(alpha) + C * self.U())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
 
-def MinMax_search(board, num_reads, net=None, C=1.0, alpha=0.25):
+def MinMax_search(board, num_reads, net=None, C=1.0, alpha=0.25, deadline=None, stop=None, info=None,
+                  walk_boards=False, **_):
     assert(net is not None)
     root = MinMaxNode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf(C, alpha)
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, lambda: root.select_leaf(C, alpha), num_reads, net, deadline, stop, info, walk_boards)
 
     size = min(5, len(root.children))
     pv = heapq.nlargest(size, root.children.items(),
                         key=lambda item: (item[1].number_visits, item[1].Q(alpha)))
-    print('MinMax pv:', [(n[0], n[1].Q(alpha), n[1].number_visits) for n in pv])
-    print('prediction:', end=' ')
+    logger.info('MinMax pv: %s', [(n[0], n[1].Q(alpha), n[1].number_visits) for n in pv])
+    prediction = []
     next = pv[0]
     while len(next[1].children):
         next = heapq.nlargest(1, next[1].children.items(),
                                 key=lambda item: (item[1].number_visits, item[1].Q(alpha)))[0]
-        print(next[0], end=' ')
-    print('')
+        prediction.append(next[0])
+    logger.info('prediction: %s', ' '.join(prediction))
     return max(root.children.items(),
                key=lambda item: (item[1].number_visits, item[1].Q(alpha)))
@@ -1,33 +1,99 @@
-import functools
+from collections import OrderedDict
+from search import instrument
+from search.cache import EvalCache, position_hash
+from search.terminal import position_value
 
 class NeuralNet:
 
-    def __init__(self, net=None, lru_size=5000):
+    def __init__(self, net=None, lru_size=5000, cache_bytes=None, disk_cache=None):
+        """
+        :param net: a lcztools network
+        :param lru_size: maximum number of cached evaluations, None for no limit
+        :param cache_bytes: maximum size of the evaluation cache, None for no limit
+        :param disk_cache: optional DiskCache, checked after the in memory cache
+        """
         super().__init__()
         assert(net is not None)
         self.net = net
-        self.evaluate = functools.lru_cache(maxsize=lru_size)(self.evaluate)
+        self.cache = EvalCache(max_entries=lru_size, max_bytes=cache_bytes)
+        self.disk_cache = disk_cache
+        self.evaluations = 0  # positions asked for, including cached and terminal ones
 
-    def evaluate(self, board):
-        result = None
-        
-        if board.pc_board.is_game_over():
-            result = board.pc_board.result()
-        elif board.is_draw():
+    def lookup(self, key):
+        result = self.cache.get(key)
+        if result is None and self.disk_cache is not None:
+            result = self.disk_cache.get(key)
+            if result is not None:
+                self.cache.put(key, result)
+        return result
+
+    def store(self, key, result):
+        self.cache.put(key, result)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, result)
+
+    def known(self, board):
+        """
+        the cache is looked up first, as a position's own terminal status is cached with it,
+        and only the draws that depend on the history are checked on every call
+        :return: (cache key, result of a terminal, drawn or cached position, else None)
+        """
+        key = position_hash(board)
+        result = self.lookup(key)
+        if result is None:
+            value = position_value(board)
+            if value is not None:
+                result = dict(), value
+                self.store(key, result)
+                return key, result
+        elif not result[0]:  # a cached terminal position
+            return key, result
+        if board.is_draw():
             # board.is_draw checks for threefold or fifty move rule
             # Don't use python-chess method, because threefold checks if next move can
-            # be threefold as well            
-            result = "1/2-1/2"
-        
-            
-        if result:
-            if result == "1/2-1/2":
-                return dict(), 0.0
+            # be threefold as well
+            return key, (dict(), 0.0)
+        return key, result
+
+    def evaluate(self, board):
+        self.evaluations += 1
+        key, result = self.known(board)
+        if result is None:
+            counters = instrument.counters
+            tick = counters.now() if counters is not None else 0.
+            policy, value = self.net.evaluate(board)
+            if counters is not None:
+                counters.lap('network', tick)
+            result = policy, (2.0*value)-1.0
+            self.store(key, result)
+        return result
+
+    def evaluate_batch(self, boards):
+        """
+        evaluate several positions with a single network call
+        :param boards: list of LeelaBoard
+        :return: list of (policy, value) in the same order
+        """
+        self.evaluations += len(boards)
+        results = [None] * len(boards)
+        pending = OrderedDict()  # Dict[key, List[index]]
+        for i, board in enumerate(boards):
+            key, results[i] = self.known(board)
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
+        if pending:
+            batch = [boards[indices[0]] for indices in pending.values()]
+            counters = instrument.counters
+            tick = counters.now() if counters is not None else 0.
+            if hasattr(self.net, 'evaluate_batch'):
+                outputs = self.net.evaluate_batch(batch)
             else:
-                # Always return -1.0 when checkmated
-                return dict(), -1.0
-            
-        policy, value = self.net.evaluate(board)
-        
-        value2 = (2.0*value)-1.0
-        return policy, value2
+                outputs = [self.net.evaluate(board) for board in batch]
+            if counters is not None:
+                counters.lap('network', tick)
+            for (key, indices), (policy, value) in zip(pending.items(), outputs):
+                result = policy, (2.0*value)-1.0
+                self.store(key, result)
+                for i in indices:
+                    results[i] = result
+        return results
@@ -0,0 +1,53 @@
+import time
+from search import instrument
+from search.board_walk import walking
+from search.terminal import LeafEvaluator
+from search.time_manager import out_of_time
+
+
+def playout(root, select, evaluate, info=None):
+    """
+    one playout of a search loop: select a leaf, evaluate and expand it, and back up its value,
+    with each phase timed while instrumentation is on
+    :param select: function that returns the next leaf
+    :param evaluate: the search's LeafEvaluator
+    :param info: optional InfoReporter, called after the expansion
+    :return: the number of nodes the expansion added
+    """
+    counters = instrument.counters
+    tick = counters.now() if counters is not None else 0.
+    leaf = select()
+    if counters is not None:
+        tick = counters.lap('select', tick)
+    child_priors, value_estimate = evaluate(leaf)
+    if counters is not None:
+        tick = counters.lap('evaluate', tick)
+    added = 0 if leaf.is_expanded else len(child_priors)
+    leaf.expand(child_priors)
+    if counters is not None:
+        tick = counters.lap('expand', tick)
+    if info is not None:
+        info(root, leaf)
+        if counters is not None:
+            tick = counters.lap('info', tick)
+    leaf.backup(value_estimate)
+    if counters is not None:
+        counters.lap('backup', tick)
+        counters.playout(leaf, child_priors)
+    return added
+
+
+def run_playouts(root, select, num_reads, net, deadline=None, stop=None, info=None, walk_boards=False):
+    """
+    the search loop of the engines that play out one leaf at a time from a new root
+    :param select: function that returns the next leaf
+    :param num_reads: the number of playouts, fewer if the deadline passes or stop is set
+    :param walk_boards: keep a board at the root only, see search.board_walk
+    """
+    with walking(root, walk_boards) as walk:
+        evaluate = LeafEvaluator(net, walk)
+        start = time.time()
+        for reads in range(num_reads):
+            if out_of_time(deadline, start, reads, stop=stop):
+                break
+            playout(root, select, evaluate, info)
@@ -0,0 +1,194 @@
+"""
+    Shared neural network evaluation server.
+
+    One process loads the weights and serves many engine processes over a unix socket.
+    Requests from all clients are grouped into a single batch per network call.
+    Requests are pickled, so clients authenticate with a random key that the server writes
+    next to the socket, readable by its own user only.
+"""
+import logging
+import os
+import stat
+import time
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_server(address):
+    """
+    :return: True if address is a unix socket, ie an EvalServer rather than a weights file
+    """
+    try:
+        return stat.S_ISSOCK(os.stat(address).st_mode)
+    except OSError:
+        return False
+
+
+def key_path(address):
+    return address + '.key'
+
+
+def read_key(address):
+    """
+    :return: the authentication key of the server on address
+    """
+    with open(key_path(address), 'rb') as f:
+        return f.read()
+
+
+def write_key(address):
+    """
+    write a new authentication key for address, readable by the current user only
+    :return: the key
+    """
+    key = os.urandom(32)
+    path = key_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def is_serving(address):
+    """
+    :return: True if a server answers on address, rather than a socket left behind by one that has exited
+    """
+    try:
+        Client(address, family='AF_UNIX', authkey=read_key(address)).close()
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    except (OSError, EOFError, AuthenticationError):
+        return True  # something is listening, even if its key isn't ours
+    return True
+
+
+class RemoteNet:
+    """
+    drop-in replacement for a lcztools network, for use as NeuralNet(net=RemoteNet(address))
+    """
+    def __init__(self, address):
+        self.address = address
+        self.conn = Client(address, family='AF_UNIX', authkey=read_key(address))
+
+    def evaluate(self, board):
+        return self.evaluate_batch([board])[0]
+
+    def evaluate_batch(self, boards):
+        self.conn.send(boards)
+        outputs = self.conn.recv()
+        if isinstance(outputs, Exception):  # the server's network failed on the batch
+            raise outputs
+        return outputs
+
+    def close(self):
+        self.conn.close()
+
+
+class EvalServer:
+    def __init__(self, net, address, max_batch=256, max_wait=0.002):
+        """
+        :param net: a lcztools network
+        :param address: path of the unix socket to listen on
+        :param max_batch: the largest number of positions per network call
+        :param max_wait: seconds to wait for more requests before evaluating a partial batch
+        """
+        self.net = net
+        self.address = address
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.positions = 0
+
+    def serve_forever(self):
+        if is_server(self.address):
+            if is_serving(self.address):
+                raise RuntimeError('another server is running on {}'.format(self.address))
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=write_key(self.address))
+        threading.Thread(target=self.batcher, daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    logger.warning('refused a client: %r', e)
+                    continue
+                threading.Thread(target=self.reader, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def reader(self, conn):
+        try:
+            while True:
+                self.requests.put((conn, conn.recv()))
+        except (EOFError, OSError):
+            conn.close()
+
+    def gather(self):
+        """
+        block for one request, then collect more until the batch is full or max_wait has passed
+        :return: list of (conn, boards)
+        """
+        pending = [self.requests.get()]
+        size = len(pending[0][1])
+        deadline = time.time() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(request)
+            size += len(request[1])
+        return pending
+
+    def evaluate_batch(self, boards):
+        if hasattr(self.net, 'evaluate_batch'):
+            return self.net.evaluate_batch(boards)
+        return [self.net.evaluate(board) for board in boards]
+
+    def batcher(self):
+        while True:
+            pending = self.gather()
+            boards = [board for _, request in pending for board in request]
+            try:
+                outputs = self.evaluate_batch(boards)
+            except Exception as e:
+                # every waiting client gets the exception, as in search.threaded, as a RuntimeError
+                # since the original may not pickle
+                logger.exception('evaluation failed')
+                error = RuntimeError('evaluation failed on the server: {!r}'.format(e))
+                for conn, _ in pending:
+                    try:
+                        conn.send(error)
+                    except OSError:
+                        pass
+                continue
+            self.batches += 1
+            self.positions += len(boards)
+            if self.batches % 1000 == 0:
+                logger.info('batches: %s occupancy: %.1f', self.batches, self.occupancy())
+
+            start = 0
+            for conn, request in pending:
+                try:
+                    conn.send(outputs[start:start + len(request)])
+                except OSError:
+                    pass
+                start += len(request)
+
+    def occupancy(self):
+        """
+        :return: mean number of positions per network call
+        """
+        return self.positions / self.batches if self.batches else 0.
@@ -0,0 +1,145 @@
+import multiprocessing
+import random
+from search.info import InfoReporter
+from search.mcts import mcts_search
+from search.remote import RemoteNet
+from search.uct import UCTNode
+
+"""
+Root parallel UCT
+
+Worker processes each search the same position with their own UCTNode tree, and their
+root children's visits and values are merged to choose the move. Each worker but the
+first mixes Dirichlet noise into its root priors, seeded anew for every search, so that
+the trees differ. Workers are forked, so they share the network and its cache as they
+were at the fork: the pool is forked again when the network or the number of workers
+changes, and the engine closes it when an option changes the network's caches. Forking
+from a thread other than the main one is unsafe, so the engine makes the pool before it
+starts a search thread. A network behind an nn_server.py socket gets one connection per
+worker, which is the way to use a GPU, as CUDA can't be forked.
+"""
+
+NOISE_ALPHA = 0.3
+NOISE_FRACTION = 0.25
+
+pool = None  # (net, workers, Pool, multiprocessing.Event) of the running workers
+worker_net = None  # NeuralNet of a worker process
+worker_stop = None  # multiprocessing.Event of a worker process
+
+
+def reconnect(net):
+    """
+    :param net: NeuralNet inherited by a forked process
+    :return: net, with a connection of its own if it is behind a socket, as a connection can't be
+             shared between processes
+    """
+    if isinstance(net.net, RemoteNet):
+        net.net = RemoteNet(net.net.address)
+    return net
+
+
+def init_worker(net, stop):
+    global worker_net, worker_stop
+    worker_net, worker_stop = reconnect(net), stop
+
+
+def noisy_priors(priors, seed):
+    """
+    :return: priors mixed with Dirichlet noise, or priors for seed 0
+    """
+    if not seed or not priors:
+        return priors
+    rng = random.Random(seed)
+    noise = [rng.gammavariate(NOISE_ALPHA, 1.) for _ in priors]
+    total = sum(noise) or 1.
+    return {move: (1 - NOISE_FRACTION) * prior + NOISE_FRACTION * n / total
+            for (move, prior), n in zip(priors.items(), noise)}
+
+
+def worker_search(board, num_reads, seed, batch_size, deadline, walk_boards):
+    """
+    :return: ({move: (visits, Q)} of the root, root visits, (playouts, depth sum, seldepth))
+    """
+    info = InfoReporter(send=None, interval=0)
+    root = UCTNode(board=board)
+    child_priors, value_estimate = worker_net.evaluate(board)
+    root.expand(noisy_priors(child_priors, seed))
+    root.backup(value_estimate)
+    if num_reads > 1 and root.children:
+        mcts_search(UCTNode, board, num_reads - 1, net=worker_net, root=root, batch_size=batch_size,
+                    deadline=deadline, stop=worker_stop, info=info, walk_boards=walk_boards)
+    children = {move: (child.number_visits, child.Q()) for move, child in root.children.items()}
+    return children, root.number_visits, (info.playouts + 1, info.depth_sum, info.seldepth)
+
+
+def get_pool(net, workers):
+    """
+    :return: (Pool, stop Event) of workers for net, forked anew if net or workers have changed
+    """
+    global pool
+    if pool is not None and (pool[0] is not net or pool[1] != workers):
+        close_pool()
+    if pool is None:
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        pool = net, workers, context.Pool(workers, initializer=init_worker, initargs=(net, stop)), stop
+    return pool[2], pool[3]
+
+
+def close_pool():
+    """
+    end the workers, so that the next search forks new ones from the current network and caches
+    """
+    global pool
+    if pool is not None:
+        pool[2].terminate()
+        pool[2].join()
+        pool = None
+
+
+def merge(board, results):
+    """
+    :return: a root whose children carry the visits of all workers, and their values weighted
+             the way UCTNode.Q weights a node's own value
+    """
+    root = UCTNode(board=board)
+    stats = {}  # Dict[move, [visits, sum of Q * weight, sum of weights]]
+    for children, root_visits, _ in results:
+        root.number_visits += root_visits
+        for move, (visits, q) in children.items():
+            entry = stats.setdefault(move, [0, 0., 0])
+            entry[0] += visits
+            entry[1] += q * (1 + visits)
+            entry[2] += 1 + visits
+    root.is_expanded = True
+    root.children = {}
+    for move, (visits, weighted, weights) in stats.items():
+        child = UCTNode(parent=root, move=move)
+        child.number_visits = visits
+        child.total_value = weighted / weights * (1 + visits)  # so that Q() is the weighted mean
+        root.children[move] = child
+    return root
+
+
+def RootParallel_search(board, num_reads, net=None, workers=2, batch_size=1, deadline=None,
+                        stop=None, info=None, walk_boards=False, **_):
+    assert(net is not None)
+    workers = max(1, workers)
+    pool, worker_stop = get_pool(net, workers)
+    worker_stop.clear()
+    share = -(-num_reads // workers)
+    seed = random.getrandbits(32)  # a different noise every search, the first worker has none
+    tasks = [(board, min(share, num_reads - i * share), i and seed + i, batch_size, deadline, walk_boards)
+             for i in range(workers) if num_reads - i * share > 0]
+    pending = pool.starmap_async(worker_search, tasks)
+    while not pending.ready():
+        pending.wait(0.05)
+        if stop is not None and stop.is_set():
+            worker_stop.set()
+    results = pending.get()
+
+    root = merge(board, results)
+    if info is not None:
+        for _, _, (playouts, depth_sum, seldepth) in results:
+            info.merge(root, playouts, depth_sum, seldepth)
+    return root.outcome()
@@ -1,6 +1,9 @@
+import logging
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
+from search.playout import run_playouts
 # import os
 
 """
@@ -10,13 +13,21 @@ Regret at Max Nodes
 """
 
 
+logger = logging.getLogger(__name__)
+
+
 class SOTANode:
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'reward', 'bellman_value', 'number_visits', 'leaf_visits',
+                 'child_sum', 'contribution')
+
     def __init__(self, board=None, parent=None, move=None, prior=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[SOTANode]
-        self.children = OrderedDict()  # Dict[move, SOTANode]
+        self.children = NO_CHILDREN  # Dict[move, SOTANode], allocated by expand
         self.prior = prior  # float
 
         self.reward = 0.  # float
@@ -25,6 +36,11 @@ class SOTANode:
         self.number_visits = 0  # int
         self.leaf_visits = 0  # int
 
+        # running sum of number_visits * bellman_value over the children, and this
+        # node's term in its parent's sum, so a backup only applies one child's change
+        self.child_sum = 0.  # float
+        self.contribution = 0.  # float
+
     def Q(self):  # returns float
         return self.bellman_value
 
@@ -58,12 +74,13 @@ class SOTANode:
                 current = current.best_child(C_min_sr, C_min_cr)  # MIN node, cumulative regret
             depth += 1
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
@@ -78,46 +95,44 @@ class SOTANode:
         self.number_visits += 1
 
         while current.parent is not None:
+            child = current
             current = current.parent
             current.number_visits += 1
+            contribution = child.number_visits * child.bellman_value
+            current.child_sum += contribution - child.contribution
+            child.contribution = contribution
             # do we want to add in this reward? its more stable and will disappear with many evals
             # keep because it matters on terminal nodes
-            current.bellman_value = current.reward * current.leaf_visits
-            for child in [n for n in current.children.values() if n.number_visits]:
-                current.bellman_value -= child.number_visits * child.bellman_value
-                # print('updating Q:', current.Q, current.number_visits, visits)
-            current.bellman_value /= current.number_visits
+            current.bellman_value = ((current.reward * current.leaf_visits - current.child_sum) /
+                                     current.number_visits)
             # print('postupdate Q:', current.Q, current.number_visits, visits)
 
     def dump(self, move):
-        print("---")
-        print("move: ", move)
-        print("belman value: ", self.bellman_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("U_cr: ", self.U_cr())
-        print("U_sr: ", self.U_sr())
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("belman value: %s", self.bellman_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("U_cr: %s", self.U_cr())
+        logger.debug("U_sr: %s", self.U_sr())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
 
 def SOTA_search(board, num_reads, net=None,
                 C_max_sr=3.4, C_max_cr=0.,
-                C_min_sr=0., C_min_cr=3.4):
+                C_min_sr=0., C_min_cr=3.4, deadline=None, stop=None, info=None,
+                walk_boards=False, **_):
     assert(net is not None)
     root = SOTANode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf(C_max_sr, C_max_cr, C_min_sr, C_min_cr)
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, lambda: root.select_leaf(C_max_sr, C_max_cr, C_min_sr, C_min_cr), num_reads, net, deadline, stop, info, walk_boards)
 
     size = min(5, len(root.children))
     pv = heapq.nlargest(size, root.children.items(),
                         key=lambda item: (item[1].number_visits, item[1].Q()))
     #
-    print('SOTA pv:', [(n[0],
+    logger.info('SOTA pv: %s', [(n[0],
                         n[1].Q(),
                         n[1].number_visits,
                         n[1].Q() + C_max_sr * n[1].U_sr() + C_max_cr * n[1].U_cr(),
@@ -1,8 +1,11 @@
+import logging
 import numpy as np
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
 import os
+from search.board_walk import node_board
+from search.playout import run_playouts
 
 """
 Asymmetric Move Selection Strategies in
@@ -11,13 +14,20 @@ Regret at Max Nodes
 """
 
 
+logger = logging.getLogger(__name__)
+
+
 class SRCRNode:
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'total_value', 'number_visits')
+
     def __init__(self, board=None, parent=None, move=None, prior=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[SRCRNode]
-        self.children = OrderedDict()  # Dict[move, SRCRNode]
+        self.children = NO_CHILDREN  # Dict[move, SRCRNode], allocated by expand
         self.prior = prior  # float
         self.total_value = -parent.Q() if parent else 0.   # float
         self.number_visits = 0  # int
@@ -53,12 +63,13 @@ class SRCRNode:
                 current = current.best_child(0., C_cr)  # MIN node, cumulative regret
             depth += 1
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
@@ -78,42 +89,39 @@ class SRCRNode:
         current.number_visits += 1
 
     def dump(self, move, C):
-        print("---")
-        print("move: ", move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q())
-        print("U_cr: ", self.U_cr())
-        print("U_sr: ", self.U_sr())
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q())
+        logger.debug("U_cr: %s", self.U_cr())
+        logger.debug("U_sr: %s", self.U_sr())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
 
-def SRCR_search(board, num_reads, net=None, C_sr=3.4, C_cr=3.4):
+def SRCR_search(board, num_reads, net=None, C_sr=3.4, C_cr=3.4, deadline=None, stop=None, info=None,
+                walk_boards=False, **_):
     assert(net is not None)
     C_sr = float(os.getenv('CP_SR', C_sr))
     C_cr = float(os.getenv('CP_CR', C_cr))
     root = SRCRNode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf(C_sr, C_cr)
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, lambda: root.select_leaf(C_sr, C_cr), num_reads, net, deadline, stop, info, walk_boards)
 
     size = min(5, len(root.children))
     pv = heapq.nlargest(size, root.children.items(),
                         key=lambda item: (item[1].number_visits, item[1].Q()))
 
-    print('SRCR (', C_sr, ',', C_cr, ') pv:', [(n[0], n[1].Q(), n[1].number_visits,
+    logger.info('SRCR ( %s , %s ) pv: %s', C_sr, C_cr, [(n[0], n[1].Q(), n[1].number_visits,
                                           C_sr*n[1].U_sr(), C_cr*n[1].U_cr()) for n in pv])
-    print('prediction:', end=' ')
+    prediction = []
     next = pv[0]
     while len(next[1].children):
         next = heapq.nlargest(1, next[1].children.items(),
                                 key=lambda item: (item[1].number_visits, item[1].Q()))[0]
-        print(next[0], end=' ')
-    print('')
+        prediction.append(next[0])
+    logger.info('prediction: %s', ' '.join(prediction))
     return max(root.children.items(),
                key=lambda item: (item[1].number_visits, item[1].Q()))
@@ -0,0 +1,81 @@
+"""
+Terminal positions
+
+Whether a position is checkmate, stalemate, insufficient material or drawn by the
+seventy-five move rule depends only on the position and its fifty move counter, ie on
+its evaluation cache key, so NeuralNet works it out once and caches it with the network's
+results, as an empty policy. A cache hit costs no move generation. Draws by repetition or
+the fifty move rule depend on the game's history, and are left to LeelaBoard.is_draw,
+which counts repetitions as moves are pushed rather than rescanning the move stack.
+A search's LeafEvaluator also flags the nodes that turn out to be terminal with their value,
+as a node's history is fixed by its path, or for a DAGNode by its board, so that revisits
+don't reach the evaluator at all, in this search or in a later one that keeps the tree.
+"""
+from search.util import NO_CHILDREN
+
+
+def position_value(board):
+    """
+    :return: -1.0 if the side to move is checkmated, 0.0 if the position is drawn by itself,
+             None if the game goes on. Draws that depend on the history aren't included.
+    """
+    pc_board = board.pc_board
+    if not any(pc_board.generate_legal_moves()):  # stops at the first legal move
+        return -1.0 if pc_board.is_check() else 0.0
+    if pc_board.is_insufficient_material() or pc_board.halfmove_clock >= 150:
+        return 0.0
+    return None
+
+
+# the evaluation of a leaf that has already been expanded, ie a DAGNode transposition into an
+# evaluated position, whose backup uses the position's current value instead
+TRANSPOSITION = NO_CHILDREN, 0.
+
+
+def known_evaluation(leaf):
+    """
+    :return: the evaluation of a leaf that needs no evaluator, ie a terminal leaf seen before or a
+             transposition, else None
+    """
+    if leaf.terminal is not None:
+        return NO_CHILDREN, leaf.terminal
+    if leaf.is_expanded and leaf.children:
+        return TRANSPOSITION
+    return None
+
+
+class LeafEvaluator:
+    def __init__(self, net, walk=None):
+        """
+        :param net: the search's NeuralNet
+        :param walk: the search's BoardWalk, if it walks one board
+        """
+        self.net = net
+        self.walk = walk
+
+    def __call__(self, leaf):
+        """
+        :return: the evaluation of leaf's position, flagging the leaf if it is terminal
+        """
+        result = known_evaluation(leaf)
+        if result is None:
+            result = self.net.evaluate(leaf.board) if self.walk is None else self.walk.evaluate(self.net, leaf)
+            if not result[0]:
+                leaf.terminal = result[1]
+        return result
+
+    def batch(self, leaves):
+        """
+        :return: list of evaluations in the order of leaves, with a single network call for the
+                 leaves that aren't known to be terminal
+        """
+        results = [known_evaluation(leaf) for leaf in leaves]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            walk = self.walk
+            boards = [leaves[i].board if walk is None else walk.copy(leaves[i]) for i in pending]
+            for i, result in zip(pending, self.net.evaluate_batch(boards)):
+                results[i] = result
+                if not result[0]:
+                    leaves[i].terminal = result[1]
+        return results
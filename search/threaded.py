@@ -0,0 +1,239 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from search import instrument
+from search.board_walk import walking
+from search.budget import NodeBudget
+from search.mcts import best_is_decided, select_leaf
+from search.time_manager import out_of_time, remaining_reads
+from search.util import NO_CHILDREN
+
+"""
+Tree parallel search
+
+Several threads search one tree. Tree work, ie selection, expansion and backup, is
+serialized by a lock, while the threads overlap on network calls, which release the GIL
+inside torch. A selected leaf carries a virtual loss until its evaluation is backed up, so
+the other threads are steered elsewhere. Evaluations go through a Batcher, which gathers
+the positions of all waiting threads into one NeuralNet.evaluate_batch call. An exception
+in one thread ends the search, and threaded_search raises it once all threads have stopped.
+"""
+
+
+class Batcher:
+    def __init__(self, net, max_batch, max_wait=0.001):
+        """
+        :param net: a NeuralNet, only ever called from the batcher's thread
+        :param max_batch: the largest number of positions per network call
+        :param max_wait: seconds to wait for more positions before evaluating a partial batch
+        """
+        self.net = net
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()  # Queue[Optional[(board, Future)]], None to stop
+        self.batches = 0
+        self.positions = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def evaluate(self, board):
+        """
+        :return: (policy, value) for board, from the next batch
+        """
+        future = Future()
+        self.requests.put((board, future))
+        return future.result()
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def gather(self):
+        """
+        block for one request, then collect more until the batch is full or max_wait has passed
+        :return: list of (board, Future), or None once closed
+        """
+        request = self.requests.get()
+        if request is None:
+            return None
+        pending = [request]
+        deadline = time.time() + self.max_wait
+        while len(pending) < self.max_batch:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self.requests.put(None)
+                break
+            pending.append(request)
+        return pending
+
+    def run(self):
+        while True:
+            pending = self.gather()
+            if pending is None:
+                return
+            try:
+                outputs = self.net.evaluate_batch([board for board, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.positions += len(pending)
+            for (_, future), output in zip(pending, outputs):
+                future.set_result(output)
+
+    def occupancy(self):
+        """
+        :return: mean number of positions per network call
+        """
+        return self.positions / self.batches if self.batches else 0.
+
+
+class TreeSearch:
+    def __init__(self, root, num_reads, batcher, virtual_loss=1, budget=None, deadline=None, stop=None,
+                 info=None, multipv=1, multipv_share=0., smart_pruning=False, walk=None):
+        self.root = root
+        self.num_reads = num_reads
+        self.batcher = batcher
+        self.virtual_loss = virtual_loss
+        self.budget = budget
+        self.deadline = deadline
+        self.stop = stop
+        self.info = info
+        self.multipv = multipv
+        self.multipv_share = multipv_share
+        self.smart_pruning = smart_pruning
+        self.walk = walk  # Optional[BoardWalk], used under the lock
+        self.lock = threading.Lock()  # held for all tree work
+        self.start = time.time()
+        self.reads = 0  # playouts started
+        self.in_flight = Counter()  # leaves carrying a virtual loss, whose parents the budget mustn't collapse
+        self.done = False  # set when the budget, smart pruning or an exception ends the search
+        self.error = None  # the first exception of a thread
+
+    def select(self):
+        """
+        :return: (leaf carrying a virtual loss, its board or None for a leaf known to be terminal),
+                 or None when the search is over
+        """
+        with self.lock:
+            if self.done or self.reads >= self.num_reads or out_of_time(self.deadline, self.start, self.reads,
+                                                                        stop=self.stop):
+                return None
+            self.reads += 1
+            leaf = select_leaf(self.root, self.multipv, self.multipv_share)
+            leaf.add_virtual_loss(self.virtual_loss)
+            self.in_flight[leaf] += 1
+            if leaf.terminal is not None:
+                return leaf, None
+            return leaf, leaf.board if self.walk is None else self.walk.copy(leaf)
+
+    def land(self, leaf):
+        """
+        take back leaf's virtual loss, under the lock
+        """
+        leaf.revert_virtual_loss(self.virtual_loss)
+        self.in_flight[leaf] -= 1
+        if not self.in_flight[leaf]:
+            del self.in_flight[leaf]
+
+    def playouts(self):
+        try:
+            while self.playout():
+                pass
+        except Exception as e:
+            with self.lock:
+                self.error = self.error or e
+                self.done = True
+
+    def playout(self):
+        """
+        :return: False once the search is over
+        """
+        counters = instrument.counters
+        tick = counters.now() if counters is not None else 0.
+        selected = self.select()
+        if selected is None:
+            return False
+        leaf, board = selected
+        if counters is not None:
+            tick = counters.lap('select', tick)
+        try:
+            if board is None:
+                child_priors, value_estimate = NO_CHILDREN, leaf.terminal
+            else:
+                child_priors, value_estimate = self.batcher.evaluate(board)
+        except BaseException:
+            with self.lock:
+                self.land(leaf)
+            raise
+        with self.lock:
+            # evaluate includes the wait for the batch, and for the lock
+            if counters is not None:
+                tick = counters.lap('evaluate', tick)
+            self.land(leaf)
+            if leaf.is_expanded and leaf.children:
+                # another thread expanded the same leaf while this one waited, and a second
+                # backup would overwrite the values its subtree has gathered since
+                return True
+            if not child_priors:
+                leaf.terminal = value_estimate
+            added = 0 if leaf.is_expanded else len(child_priors)
+            leaf.expand(child_priors)
+            if counters is not None:
+                tick = counters.lap('expand', tick)
+            if self.info is not None:
+                self.info(self.root, leaf)
+                if counters is not None:
+                    tick = counters.lap('info', tick)
+            leaf.backup(value_estimate)
+            if counters is not None:
+                counters.lap('backup', tick)
+                counters.playout(leaf, child_priors)
+            if self.budget is not None and not self.budget.grow(added, {n.parent for n in self.in_flight}):
+                self.done = True
+            if self.smart_pruning and best_is_decided(
+                    self.root, remaining_reads(self.num_reads, self.reads, self.start, self.deadline)):
+                self.done = True
+        return True
+
+
+def threaded_search(nodeclass, board, num_reads, net=None, root=None, threads=2, virtual_loss=1,
+                    max_nodes=None, budget=None, deadline=None, stop=None, info=None, multipv=1,
+                    multipv_share=0., smart_pruning=False, walk_boards=False, **_):
+    """
+    :param threads: number of threads searching the tree
+    :param max_nodes, budget, multipv, multipv_share, smart_pruning: as for search.mcts.mcts_search
+    :param walk_boards: keep a board only at the root, see search.board_walk
+    """
+    assert(net is not None)
+    if not root:
+        root = nodeclass(board=board)
+    if budget is None and max_nodes:
+        budget = NodeBudget(max_nodes)
+    if budget is not None:
+        budget.start(root)
+    threads = max(1, threads)
+    batcher = Batcher(net, max_batch=threads)
+    try:
+        with walking(root, walk_boards) as walk:
+            tree_search = TreeSearch(root, num_reads, batcher, virtual_loss, budget, deadline, stop, info,
+                                     multipv, multipv_share, smart_pruning, walk)
+            workers = [threading.Thread(target=tree_search.playouts) for _ in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+    finally:
+        batcher.close()
+    if tree_search.error is not None:
+        raise tree_search.error
+    return root.outcome()
@@ -0,0 +1,90 @@
+import sys
+import time
+
+"""
+UCI time management
+
+A move gets an even share of the remaining time over the moves to go, plus most of the
+increment, once a fixed overhead for the GUI and the engine's own bookkeeping has been
+kept back from the clock, and never less than MIN_BUDGET. Searches
+stop at the deadline, and stop early when one more playout at the rate measured so far
+would run past it, which covers the latency of the last network call. Time left over by
+a search that ends early, eg by smart pruning, stays on the clock, and so in the share of
+the moves that follow.
+"""
+
+UNLIMITED = sys.maxsize  # reads for a search that only stops at its deadline
+MIN_BUDGET = 0.01  # seconds, enough for a few playouts however short the clock
+
+
+def out_of_time(deadline, start, reads, next_reads=1, stop=None):
+    """
+    :param deadline: time.time() by which the search must end, or None
+    :param start: time.time() at the start of the search
+    :param reads: playouts done so far
+    :param next_reads: playouts in the next step, ie a batch
+    :param stop: optional threading.Event, set by uci stop
+    :return: True if the search has been stopped, or the next step, at the rate so far,
+             would end after the deadline. A search always gets one playout.
+    """
+    if not reads:
+        return False
+    if stop is not None and stop.is_set():
+        return True
+    if deadline is None:
+        return False
+    now = time.time()
+    return now + (now - start) * next_reads / reads >= deadline
+
+
+def remaining_reads(num_reads, reads, start, deadline):
+    """
+    :return: playouts the search can still make, by its read limit and its deadline at the rate so far
+    """
+    remaining = num_reads - reads
+    if deadline is not None and reads:
+        now = time.time()
+        if now > start:
+            remaining = min(remaining, (deadline - now) * reads / (now - start))
+    return remaining
+
+
+class TimeManager:
+    def __init__(self, move_overhead=0.1, moves_to_go=30):
+        """
+        :param move_overhead: seconds kept back from every move
+        :param moves_to_go: moves the remaining time is shared over, without movestogo
+        """
+        self.move_overhead = move_overhead
+        self.moves_to_go = moves_to_go
+
+    def budget(self, limits, white):
+        """
+        :param limits: the arguments of a uci go command, times in ms
+        :param white: True if white is to move
+        :return: seconds to spend on the move, or None for no time limit
+        """
+        if 'movetime' in limits:
+            return max(MIN_BUDGET, limits['movetime'] / 1000. - self.move_overhead)
+        remaining = limits.get('wtime' if white else 'btime')
+        if remaining is None:
+            return None
+        remaining = max(0., remaining - self.move_overhead * 1000.)
+        increment = limits.get('winc' if white else 'binc', 0)
+        moves = max(1, min(limits.get('movestogo', self.moves_to_go), self.moves_to_go))
+        budget = remaining / moves + 0.75 * increment
+        # never stake more than half the clock on one move, unless it is the last before the control
+        budget = min(budget, remaining if moves == 1 else remaining / 2)
+        return max(MIN_BUDGET, budget / 1000.)
+
+    def search_limits(self, limits, white, default_reads):
+        """
+        :param default_reads: reads for a go command without a node or time limit, that isn't infinite
+        :return: (reads, deadline) for the search, deadline None for no time limit
+        """
+        if limits.get('infinite'):
+            return limits.get('nodes', UNLIMITED), None
+        budget = self.budget(limits, white)
+        reads = limits.get('nodes', default_reads if budget is None else UNLIMITED)
+        deadline = time.time() + budget if budget is not None else None
+        return reads, deadline
@@ -0,0 +1,126 @@
+"""
+    Recorded network evaluations.
+
+    RecordingNet wraps a network and appends each position it evaluates to a trace file,
+    and ReplayNet serves a trace back in place of the network, so that searches can be
+    profiled and compared without torch. Each record holds the position hash, the policy in
+    its original order and the value. Priors are stored as 32 bit floats when that is
+    lossless, as it is for torch outputs, and as 64 bit floats otherwise, so that a replayed
+    search makes exactly the choices of the recorded one.
+"""
+import os
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from search.cache import position_hash
+from search.disk_cache import encode_move, decode_move
+
+MAGIC = b'LLTRACE1'
+HEADER = struct.Struct('<QHBd')  # key, number of moves, wide priors flag, value
+
+
+def is_trace(path):
+    """
+    :return: True if path is a trace file rather than a weights file or socket
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except (OSError, TypeError):
+        return False
+
+
+def encode_record(key, policy, value):
+    moves = np.array([encode_move(move) for move in policy], dtype='<u2')
+    priors = np.array(list(policy.values()), dtype='<f8')
+    narrow = priors.astype('<f4')
+    wide = not np.array_equal(narrow.astype('<f8'), priors)
+    return (HEADER.pack(key, len(policy), wide, float(value)) + moves.tobytes() +
+            (priors if wide else narrow).tobytes())
+
+
+def read_trace(path):
+    """
+    :return: {position hash: (policy, value)} of a trace file
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a trace file'.format(path))
+    results = {}
+    offset = len(MAGIC)
+    while offset + HEADER.size <= len(data):
+        key, count, wide, value = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        moves = np.frombuffer(data, dtype='<u2', count=count, offset=offset)
+        offset += moves.nbytes
+        priors = np.frombuffer(data, dtype='<f8' if wide else '<f4', count=count, offset=offset)
+        offset += priors.nbytes
+        policy = OrderedDict(zip(map(decode_move, moves.tolist()), priors.tolist()))
+        results[key] = policy, value
+    return results
+
+
+class RecordingNet:
+    """
+    drop-in replacement for a lcztools network that records the evaluations of another
+    """
+    def __init__(self, net, path):
+        self.net = net
+        self.path = path
+        self.recorded = set()
+        if not os.path.exists(path) or not os.path.getsize(path):
+            with open(path, 'wb') as f:
+                f.write(MAGIC)
+        elif not is_trace(path):
+            raise ValueError('{} is not a trace file'.format(path))
+        else:
+            self.recorded.update(read_trace(path))
+
+    def evaluate(self, board):
+        return self.evaluate_batch([board])[0]
+
+    def evaluate_batch(self, boards):
+        if hasattr(self.net, 'evaluate_batch'):
+            outputs = self.net.evaluate_batch(boards)
+        else:
+            outputs = [self.net.evaluate(board) for board in boards]
+        results = []
+        records = []
+        for board, (policy, value) in zip(boards, outputs):
+            # python floats, as a replay returns, so that numpy scalars don't round differently
+            policy = OrderedDict((move, float(prior)) for move, prior in policy.items())
+            value = float(value)
+            results.append((policy, value))
+            key = position_hash(board)
+            if key not in self.recorded:
+                self.recorded.add(key)
+                records.append(encode_record(key, policy, value))
+        if records:
+            # one unbuffered append, so that forked processes sharing a trace don't interleave records
+            with open(self.path, 'ab', buffering=0) as f:
+                f.write(b''.join(records))
+        return results
+
+
+class ReplayNet:
+    """
+    drop-in replacement for a lcztools network that serves the evaluations of a trace
+    """
+    def __init__(self, path):
+        self.path = path
+        self.results = read_trace(path)
+
+    def evaluate(self, board):
+        key = position_hash(board)
+        try:
+            policy, value = self.results[key]
+        except KeyError:
+            raise KeyError('{} is not in the trace {}, was it recorded with the same search?'.format(
+                board.pc_board.fen(), self.path))
+        return policy, value
+
+    def evaluate_batch(self, boards):
+        return [self.evaluate(board) for board in boards]
@@ -1,14 +1,21 @@
+import logging
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
 
 """
 Standard UCT
 """
 
 
+logger = logging.getLogger(__name__)
+
+
 class UCTNode:
     name = 'uct'
+    __slots__ = ('cpuct', 'board', 'move', 'is_expanded', 'terminal', 'parent', 'children',
+                 'prior', 'total_value', 'number_visits', 'reward')
 
     def __init__(self, board=None, parent=None, move=None, prior=0,
                  cpuct=3.4):
@@ -17,8 +24,9 @@ class UCTNode:
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float], value of a terminal position, see search.terminal
         self.parent = parent  # Optional[UCTNode]
-        self.children = OrderedDict()  # Dict[move, UCTNode]
+        self.children = NO_CHILDREN  # Dict[move, UCTNode], allocated by expand
         self.prior = prior  # float
         self.total_value = 0.  # float
         self.number_visits = 0  # int
@@ -59,22 +67,35 @@ class UCTNode:
         while current.is_expanded and current.children:
             current = current.best_child()
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
     def add_child(self, move, prior):
         self.children[move] = self.__class__(parent=self, move=move, prior=prior)
+
+    def collapse(self):
+        """
+        turn a node none of whose children have been expanded back into an unexpanded leaf,
+        keeping its own statistics: a node that has been backed up through holds its value in
+        total_value, with no reward, and backup leaves both alone when it is expanded again
+        """
+        for child in self.children.values():
+            child.parent = None
+        self.children = NO_CHILDREN
+        self.is_expanded = False
     
     def backup(self, value_estimate: float):
         current = self
-        current.reward = -value_estimate
-        current.total_value = current.reward
+        if not current.number_visits:  # else a collapsed node, see collapse
+            current.reward = -value_estimate
+            current.total_value = current.reward
         # Child nodes are multiplied by -1 because we want max(-opponent eval)
         turnfactor = -1
         while current.parent is not None:
@@ -84,38 +105,55 @@ class UCTNode:
             current.total_value += (value_estimate * turnfactor)
             current.reward = 0.
 
+    def add_virtual_loss(self, virtual_loss=1):
+        """
+        pretend the path from the root to this leaf has been visited and lost, so that
+        further selections in the same batch are steered elsewhere
+        :param virtual_loss: number of losses to add, negative to revert
+        """
+        current = self
+        while current is not None:
+            current.number_visits += virtual_loss
+            current.total_value -= virtual_loss
+            current = current.parent
+
+    def revert_virtual_loss(self, virtual_loss=1):
+        self.add_virtual_loss(-virtual_loss)
+
     def dump(self):
-        print("---")
-        print("move: ", self.move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q())
-        print("U: ", self.U())
-        print("BestMove: ", self.Q() + self.cpuct * self.U())
+        logger.debug("---")
+        logger.debug("move: %s", self.move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q())
+        logger.debug("U: %s", self.U())
+        logger.debug("BestMove: %s", self.Q() + self.cpuct * self.U())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
     def outcome(self):
         size = min(5, len(self.children))
         pv = heapq.nlargest(size, self.children.items(),
                             key=lambda item: (item[1].number_visits, item[1].Q()))
 
-        print(self.name, 'pv:', [(n[0], n[1].Q(), n[1].U(), n[1].number_visits) for n in pv])
+        logger.info('%s pv: %s', self.name, [(n[0], n[1].Q(), n[1].U(), n[1].number_visits) for n in pv])
 
         next = pv[0]
-        print('prediction:', next[0], end=' ')
+        prediction = [next[0]]
         while len(next[1].children):
             next = heapq.nlargest(1, next[1].children.items(),
                                     key=lambda item: (item[1].number_visits, item[1].Q()))[0]
-            print(next[0], end=' ')
-        print('')
+            prediction.append(next[0])
+        logger.info('prediction: %s', ' '.join(prediction))
 
         return pv[0]
 
 
 class adaptive_mixin:
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(adaptive_mixin, self).__init__(**kwargs)
 
@@ -126,3 +164,4 @@ class adaptive_mixin:
 
 class AdaptNode(adaptive_mixin, UCTNode):
     name = 'adapt'
+    __slots__ = ()
@@ -1,17 +1,27 @@
+import logging
 import numpy as np
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
 import os
+from search.board_walk import node_board
+from search.playout import run_playouts
+
+
+logger = logging.getLogger(__name__)
 
 
 class UCTVNode():
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'total_value', 'total_vsquared', 'number_visits')
+
     def __init__(self, board=None, parent=None, move=None, prior=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[UCTNode]
-        self.children = OrderedDict()  # Dict[move, UCTNode]
+        self.children = NO_CHILDREN  # Dict[move, UCTNode], allocated by expand
         self.prior = prior  # float
         self.total_value = -parent.Q() if parent else 0.   # float
         self.total_vsquared = parent.sigma() ** 2 + parent.Q() ** 2 if parent else 0.   # float
@@ -41,12 +51,13 @@ class UCTVNode():
         while current.is_expanded and current.children:
             current = current.best_child(C, zeta)
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
@@ -66,29 +77,26 @@ class UCTVNode():
         current.number_visits += 1
 
     def dump(self, move, C):
-        print("---")
-        print("move: ", move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q())
-        print("U: ", self.U())
-        print("BestMove: ", self.Q() + C * self.U())
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q())
+        logger.debug("U: %s", self.U())
+        logger.debug("BestMove: %s", self.Q() + C * self.U())
         # print("math.sqrt({}) * {} / (1 + {}))".format(self.parent.number_visits,
         #      self.prior, self.number_visits))
-        print("---")
+        logger.debug("---")
 
 
-def UCTV_search(board, num_reads, net=None, C=3.4, zeta=10.0):
+def UCTV_search(board, num_reads, net=None, C=3.4, zeta=10.0, deadline=None, stop=None, info=None,
+                walk_boards=False, **_):
     assert(net is not None)
     #zeta = float(os.getenv('ZETA', zeta))
     #C = float(os.getenv('C', C))
     root = UCTVNode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf(C, zeta)
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, lambda: root.select_leaf(C, zeta), num_reads, net, deadline, stop, info, walk_boards)
 
     # NOte that with UCT, we generally get the best results with the robust best
     # move: the one we've sampled the most.
@@ -103,7 +111,7 @@ def UCTV_search(board, num_reads, net=None, C=3.4, zeta=10.0):
     pv = heapq.nlargest(size, root.children.items(),
                         key=lambda item: (item[1].number_visits, item[1].Q()))
 
-    print('UCTV pv:', C, zeta, [(n[0], n[1].Q(), zeta * n[1].prior * n[1].U() * n[1].sigma(), n[1].number_visits, n[1].sigma()) for n in pv])
+    logger.info('UCTV pv: %s %s %s', C, zeta, [(n[0], n[1].Q(), zeta * n[1].prior * n[1].U() * n[1].sigma(), n[1].number_visits, n[1].sigma()) for n in pv])
     return pv[0]
 
 
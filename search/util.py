@@ -1,4 +1,6 @@
 import numpy as np
+import resource
+from types import MappingProxyType
 
 
 def softmax2(x):
@@ -22,3 +24,14 @@ def temp_softmax(x, sm=2.2):
         z2 = list(map(lambda v: v*scale, z))
         z = z2
     return z
+
+
+# shared, read-only children of every node that has not been expanded
+NO_CHILDREN = MappingProxyType({})
+
+
+def peak_rss_mb():
+    """
+    :return: peak resident set size of this process in MB, ru_maxrss is in KB on linux
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
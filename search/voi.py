@@ -8,13 +8,18 @@
     Selecting Computations:  Theory and Applications
     https://arxiv.org/pdf/1207.5879.pdf
 """
+import logging
 import math
 import heapq
 from search.uct import UCTNode
 
 
+logger = logging.getLogger(__name__)
+
+
 class VOINode(UCTNode):
     name = 'voi'
+    __slots__ = ()
 
     def __init__(self, **kwargs):
         super(VOINode, self).__init__(**kwargs)
@@ -56,14 +61,14 @@ class VOINode(UCTNode):
                             key=lambda item: (item[1].number_visits, item[1].Q()))
         best = pv[1] if len(pv) > 1 and pv[1][1].Q() > pv[0][1].Q() else pv[0]
 
-        print(self.name, 'pv:', [(n[0], n[1].Q(), n[1].U(), n[1].number_visits) for n in pv])
+        logger.info('%s pv: %s', self.name, [(n[0], n[1].Q(), n[1].U(), n[1].number_visits) for n in pv])
 
         prediction = best
-        print('prediction:', prediction[0], end=' ')
+        moves = [prediction[0]]
         while len(prediction[1].children):
             prediction = heapq.nlargest(1, prediction[1].children.items(),
                                         key=lambda item: (item[1].number_visits, item[1].Q()))[0]
-            print(prediction[0], end=' ')
-        print('')
+            moves.append(prediction[0])
+        logger.info('prediction: %s', ' '.join(moves))
 
         return best
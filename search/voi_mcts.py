@@ -5,18 +5,28 @@
     David Tolpin, Solomon Eyal Shimony
     https://pdfs.semanticscholar.org/2a81/bfc05ddec612fd9bf0aafad0a86ad13b0361.pdf
 """
+import logging
 import math
 import heapq
-from collections import OrderedDict
+from search.util import NO_CHILDREN
+from search.board_walk import node_board
+from search.playout import run_playouts
+
+
+logger = logging.getLogger(__name__)
 
 
 class VOINode:
+    __slots__ = ('board', 'move', 'is_expanded', 'terminal', 'parent', 'children', 'prior',
+                 'total_value', 'number_visits')
+
     def __init__(self, board=None, parent=None, move=None, prior=0):
         self.board = board
         self.move = move
         self.is_expanded = False
+        self.terminal = None  # Optional[float]
         self.parent = parent  # Optional[UCTNode]
-        self.children = OrderedDict()  # Dict[move, UCTNode]
+        self.children = NO_CHILDREN  # Dict[move, UCTNode], allocated by expand
         self.prior = prior  # float
         self.total_value = 0  # float
         self.number_visits = 0  # int
@@ -55,12 +65,13 @@ class VOINode:
         while current.is_expanded and current.children:
             current = current.best_child()
         if not current.board:
-            current.board = current.parent.board.copy()
-            current.board.push_uci(current.move)
+            current.board = node_board(current)
         return current
 
     def expand(self, child_priors):
         self.is_expanded = True
+        if child_priors:
+            self.children = {}
         for move, prior in child_priors.items():
             self.add_child(move, prior)
 
@@ -80,26 +91,23 @@ class VOINode:
         current.number_visits += 1
 
     def dump(self, move):
-        print("---")
-        print("move: ", move)
-        print("total value: ", self.total_value)
-        print("visits: ", self.number_visits)
-        print("prior: ", self.prior)
-        print("Q: ", self.Q())
-        print("---")
+        logger.debug("---")
+        logger.debug("move: %s", move)
+        logger.debug("total value: %s", self.total_value)
+        logger.debug("visits: %s", self.number_visits)
+        logger.debug("prior: %s", self.prior)
+        logger.debug("Q: %s", self.Q())
+        logger.debug("---")
 
 
-def VOI_search(board, num_reads, net=None):
+def VOI_search(board, num_reads, net=None, deadline=None, stop=None, info=None,
+               walk_boards=False, **_):
     assert(net is not None)
     root = VOINode(board)
-    for _ in range(num_reads):
-        leaf = root.select_leaf()
-        child_priors, value_estimate = net.evaluate(leaf.board)
-        leaf.expand(child_priors)
-        leaf.backup(value_estimate)
+    run_playouts(root, root.select_leaf, num_reads, net, deadline, stop, info, walk_boards)
 
     pv = sorted(root.children.items(), key=lambda item: (item[1].Q(), item[1].number_visits), reverse=True)
 
-    print('pv:', [(n[0], n[1].Q(), n[1].number_visits) for n in pv])
+    logger.info('pv: %s', [(n[0], n[1].Q(), n[1].number_visits) for n in pv])
     return max(root.children.items(),
                key=lambda item: (item[1].Q(), item[1].number_visits))
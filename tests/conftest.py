@@ -0,0 +1,19 @@
+"""
+The tests import the repository's modules from its root. Importing search needs lcztools,
+so modules that do skip themselves without it.
+"""
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+
+def board(*moves, fen=None):
+    """
+    :return: a LeelaBoard of fen, the starting position by default, after moves
+    """
+    from lcztools import LeelaBoard  # only the modules that skip without lcztools call this
+    board = LeelaBoard(fen=fen) if fen else LeelaBoard()
+    for move in moves:
+        board.push_uci(move)
+    return board
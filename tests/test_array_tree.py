@@ -0,0 +1,37 @@
+"""
+ArrayNode keeps the node statistics in numpy arrays in place of UCTNode objects, and must
+search exactly as UCTNode does.
+"""
+import pytest
+
+pytest.importorskip('lcztools')
+
+import search
+from bench_util import PlaceholderBoard, SyntheticNet
+
+READS = 800
+
+
+def visits(node, path=()):
+    """
+    :return: {path: number_visits} of node's tree
+    """
+    tree = {path: node.number_visits}
+    for move, child in node.children.items():
+        tree.update(visits(child, path + (move,)))
+    return tree
+
+
+@pytest.mark.parametrize('batch_size', [1, 4])
+def test_array_visits_match_uct(batch_size):
+    def search_tree(nodeclass):
+        root = nodeclass(board=PlaceholderBoard())
+        best, _ = search.mcts_search(nodeclass, None, READS, net=SyntheticNet(), root=root,
+                                     batch_size=batch_size)
+        return best, visits(root)
+
+    best, tree = search_tree(search.UCTNode)
+    array_best, array_tree = search_tree(search.ArrayNode)
+    assert array_best == best
+    assert array_tree == tree
+    assert len(tree) > 100
@@ -0,0 +1,66 @@
+"""
+The incremental backups keep running sums over a node's children. After a search every
+node must hold what a full backup, summing over all of its children, would give it.
+"""
+import pytest
+
+pytest.importorskip('lcztools')
+
+import search
+from search.bellman_backup import Bellman_search
+from search.budget import NodeBudget
+from bench_util import PlaceholderBoard, SyntheticNet
+
+READS = 2000
+
+
+def nodes(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.children.values())
+
+
+def full_dpuct(node):
+    """
+    :return: (total_value, best_q) of node by summing over its visited children
+    """
+    visited = [child for child in node.children.values() if child.number_visits]
+    value_sum = sum(child.backup_weight() * child.V() for child in visited)
+    weight_sum = sum(child.backup_weight() for child in visited)
+    return value_sum * node.number_visits / weight_sum, max(child.Q() for child in visited)
+
+
+@pytest.mark.parametrize('max_nodes', [None, 500])
+@pytest.mark.parametrize('nodeclass', [search.DPUCTNode, search.MaxUCTNode])
+def test_dpuct_backup_matches_full_backup(nodeclass, max_nodes):
+    root = nodeclass(board=PlaceholderBoard())
+    budget = NodeBudget(max_nodes) if max_nodes else None
+    search.mcts_search(nodeclass, None, READS, net=SyntheticNet(), root=root, budget=budget)
+    assert budget is None or budget.prunings
+    checked = 0
+    for node in nodes(root):
+        # a collapsed node forgets the children it dropped
+        assert node.best is None or node.best.parent is node
+        if any(child.number_visits for child in node.children.values()):
+            total_value, best_q = full_dpuct(node)
+            assert node.total_value == pytest.approx(total_value, rel=1e-9, abs=1e-12)
+            assert node.best_q == best_q
+            checked += 1
+    assert checked > 10
+
+
+@pytest.mark.parametrize('engine, value', [(Bellman_search, lambda node: node.Q),
+                                           (search.SOTA_search, lambda node: node.bellman_value)])
+def test_bellman_backup_matches_full_backup(engine, value):
+    _, child = engine(PlaceholderBoard(), READS, net=SyntheticNet())
+    root = child.parent
+    checked = 0
+    for node in nodes(root):
+        if node.number_visits:
+            child_sum = sum(child.number_visits * value(child) for child in node.children.values())
+            expected = (node.reward * node.leaf_visits - child_sum) / node.number_visits
+            assert value(node) == pytest.approx(expected, rel=1e-9, abs=1e-12)
+            checked += 1
+    assert checked > 100
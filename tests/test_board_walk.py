@@ -0,0 +1,70 @@
+import pytest
+
+lcztools = pytest.importorskip('lcztools')
+
+import search
+from search.board_walk import BoardWalk, walking
+from bench_util import HashNet
+from conftest import board
+
+
+def state(board):
+    return board.pc_board.fen(), board.pc_board.move_stack
+
+
+def test_walk_pops_back_to_the_common_path():
+    root = search.UCTNode(board=lcztools.LeelaBoard())
+    root.expand({'e2e4': 0.5, 'd2d4': 0.5})
+    e4 = root.children['e2e4']
+    e4.expand({'e7e5': 0.5, 'c7c5': 0.5})
+    e5, c5 = e4.children['e7e5'], e4.children['c7c5']
+    e5.expand({'g1f3': 1.})
+
+    walk = BoardWalk(root)
+    assert root.board is None
+    for leaf, moves in ((e5.children['g1f3'], ('e2e4', 'e7e5', 'g1f3')),
+                        (c5, ('e2e4', 'c7c5')),
+                        (root.children['d2d4'], ('d2d4',)),
+                        (root, ()),
+                        (e5, ('e2e4', 'e7e5'))):
+        walk.goto(leaf)
+        assert walk.path == list(moves)
+        assert state(walk.board) == state(board(*moves))
+        copy = walk.copy(leaf)
+        assert copy is not walk.board and state(copy) == state(walk.board)
+    walk.close()
+    assert state(root.board) == state(lcztools.LeelaBoard())
+
+
+def test_walking_gives_the_root_its_board_back():
+    root = search.UCTNode(board=lcztools.LeelaBoard())
+    board = root.board
+    with pytest.raises(RuntimeError):
+        with walking(root) as walk:
+            assert walk is not None and root.board is None
+            raise RuntimeError()
+    assert root.board is board
+
+    with walking(root, walk_boards=False) as walk:
+        assert walk is None and root.board is board
+    # nodes keyed by their board keep them
+    dag = search.DAGNode(board=lcztools.LeelaBoard())
+    with walking(dag) as walk:
+        assert walk is None and dag.board is not None
+
+
+@pytest.mark.parametrize('batch_size', [1, 4])
+def test_walked_search_matches_a_search_with_boards(batch_size):
+    def search_uct(walk_boards):
+        root = search.UCTNode(board=lcztools.LeelaBoard())
+        best, _ = search.mcts_search(search.UCTNode, None, 300, net=search.NeuralNet(net=HashNet()),
+                                     root=root, batch_size=batch_size, walk_boards=walk_boards)
+        return best, root
+
+    best, root = search_uct(False)
+    walked_best, walked_root = search_uct(True)
+    assert walked_best == best
+    assert ([(move, child.number_visits) for move, child in walked_root.children.items()] ==
+            [(move, child.number_visits) for move, child in root.children.items()])
+    assert walked_root.board is not None
+    assert all(child.board is None for child in walked_root.children.values())
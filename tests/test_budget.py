@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip('lcztools')
+
+import search
+from search.budget import NodeBudget, frontier, prune, tree_size
+from search.playout import playout
+from search.terminal import LeafEvaluator
+from bench_util import PlaceholderBoard, SyntheticNet
+
+
+def tree():
+    """
+    :return: (root, its children by move), with a and b expanded and c a leaf
+    """
+    root = search.UCTNode(board=PlaceholderBoard())
+    root.expand({'a': 0.5, 'b': 0.3, 'c': 0.2})
+    children = root.children
+    children['a'].expand({'a1': 0.6, 'a2': 0.4})
+    children['b'].expand({'b1': 0.7, 'b2': 0.2, 'b3': 0.1})
+    children['a'].number_visits = 10
+    children['b'].number_visits = 3
+    return root, children
+
+
+def test_tree_size_and_frontier():
+    root, children = tree()
+    assert tree_size(root) == 1 + 3 + 2 + 3
+    assert set(frontier(root)) == {children['a'], children['b']}
+
+
+def test_prune_collapses_the_least_visited_first():
+    root, children = tree()
+    assert prune(root, tree_size(root), 7) == 6
+    b = children['b']
+    assert not b.is_expanded and not b.children
+    assert b.number_visits == 3  # a collapsed node keeps its statistics
+    assert children['a'].is_expanded
+    assert tree_size(root) == 6
+
+
+def test_prune_spares_kept_nodes():
+    root, children = tree()
+    assert prune(root, tree_size(root), 7, keep={children['b']}) == 7
+    assert children['b'].is_expanded
+    assert not children['a'].is_expanded
+
+
+@pytest.mark.parametrize('nodeclass', [search.UCTNode, search.DPUCTNode, search.MaxUCTNode])
+def test_collapsed_node_keeps_its_value(nodeclass):
+    net = SyntheticNet()
+    root = nodeclass(board=PlaceholderBoard())
+    search.mcts_search(nodeclass, None, 1000, net=net, root=root)
+    # collapse from the bottom up until the frontier reaches nodes that have been backed up through
+    while not any(node.number_visits for node in frontier(root)):
+        for node in frontier(root):
+            node.collapse()
+    node = max(frontier(root), key=lambda n: n.number_visits)
+    q = node.Q()
+    node.collapse()
+    assert node.Q() == q
+    playout(root, lambda: node, LeafEvaluator(net))
+    assert node.is_expanded and node.children
+    assert node.Q() == pytest.approx(q)
+
+
+@pytest.mark.parametrize('nodeclass', [search.UCTNode, search.MaxUCTNode])
+def test_search_keeps_to_the_budget(nodeclass):
+    budget = NodeBudget(500)
+    root = nodeclass(board=PlaceholderBoard())
+    search.mcts_search(nodeclass, None, 3000, net=SyntheticNet(), root=root, budget=budget)
+    assert budget.prunings
+    assert budget.size == tree_size(root) <= 500
+    assert root.number_visits >= 2999  # the search ran to its read limit
+
+
+def test_search_stops_when_nodes_cant_collapse():
+    budget = NodeBudget(500)
+    root = search.ArrayNode(board=PlaceholderBoard())
+    search.mcts_search(search.ArrayNode, None, 3000, net=SyntheticNet(), root=root, budget=budget)
+    assert not budget.prunings
+    assert budget.size <= 500 + 30
+    assert root.number_visits < 100
@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip('lcztools')
+
+from search.cache import EvalCache, position_hash, entry_bytes
+from conftest import board
+
+
+def result(value, moves=('e2e4', 'd2d4')):
+    return {move: 1. / len(moves) for move in moves}, value
+
+
+def test_position_hash_is_stable():
+    assert position_hash(board('e2e4', 'e7e5')) == position_hash(board('e2e4', 'e7e5'))
+    assert position_hash(board('e2e4')) != position_hash(board('d2d4'))
+
+
+def test_position_hash_covers_history_and_fifty_move_counter():
+    # the same position reached by two move orders has different history planes
+    one = board('g1f3', 'g8f6', 'b1c3')
+    other = board('b1c3', 'g8f6', 'g1f3')
+    assert one.pc_board.board_fen() == other.pc_board.board_fen()
+    assert position_hash(one) != position_hash(other)
+    assert position_hash(one, history=0) == position_hash(other, history=0)
+
+    fen = '8/8/4k3/8/8/4K3/4P3/8 w - - {} 60'
+    assert position_hash(board(fen=fen.format(0))) != position_hash(board(fen=fen.format(10)))
+
+
+def test_lru_eviction_by_entries():
+    cache = EvalCache(max_entries=2)
+    cache.put(1, result(0.1))
+    cache.put(2, result(0.2))
+    assert cache.get(1) == result(0.1)  # 2 is now the least recently used
+    cache.put(3, result(0.3))
+    assert cache.get(2) is None
+    assert cache.get(1) == result(0.1)
+    assert cache.get(3) == result(0.3)
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.hit_rate() == 0.75
+    assert cache.hashfull() == 1000
+
+
+def test_eviction_by_bytes_and_resize():
+    size = entry_bytes(result(0.1))
+    cache = EvalCache(max_bytes=3 * size)
+    for key in range(5):
+        cache.put(key, result(0.1))
+    assert len(cache) == 3
+    assert cache.bytes == 3 * size
+    assert [cache.get(key) is None for key in range(5)] == [True, True, False, False, False]
+
+    cache.resize(max_bytes=size)
+    assert len(cache) == 1
+    assert cache.get(4) == result(0.1)
+
+
+def test_put_replaces_an_entry():
+    cache = EvalCache(max_bytes=1 << 20)
+    cache.put(1, result(0.1))
+    cache.put(1, result(0.5, moves=('e2e4',)))
+    assert len(cache) == 1
+    assert cache.get(1) == result(0.5, moves=('e2e4',))
+    assert cache.bytes == entry_bytes(result(0.5, moves=('e2e4',)))
@@ -0,0 +1,62 @@
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('lcztools')
+
+import search
+from bench_util import HashNet
+from conftest import board
+
+# many move orders reach the same positions
+QUEEN_ENDING = '8/5k2/8/8/8/3K4/4Q3/8 w - -'
+
+
+def reachable(root):
+    """
+    :return: set of the nodes of root's graph
+    """
+    nodes = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node not in nodes:
+            nodes.add(node)
+            stack.extend(node.children.values())
+    return nodes
+
+
+def test_advanced_root_releases_earlier_positions():
+    net = search.NeuralNet(net=HashNet())
+    position = board()
+    root = search.DAGNode(board=position)
+    for _ in range(6):
+        best, _ = search.mcts_search(search.DAGNode, position, 500, net=net, root=root)
+        position = position.copy()
+        position.push_uci(best)
+        root = search.advance_root(root, [best], position)
+        nodes = reachable(root)
+        assert len(root.table) == len(nodes)
+        assert all(node.table is root.table for node in nodes)
+
+
+def test_transpositions_share_a_node():
+    calls, roots = {}, {}
+    for nodeclass in (search.UCTNode, search.DAGNode):
+        net = search.NeuralNet(net=HashNet(), lru_size=None)
+        roots[nodeclass] = nodeclass(board=board(fen=QUEEN_ENDING))
+        search.mcts_search(nodeclass, None, 2000, net=net, root=roots[nodeclass])
+        calls[nodeclass] = net.cache.misses
+    # each position is evaluated once, where uct evaluates it once per move order
+    assert calls[search.DAGNode] < calls[search.UCTNode]
+
+    edge_visits, parents = Counter(), Counter()
+    for node in reachable(roots[search.DAGNode]):
+        for edge in node.edges:
+            if edge.child is not None:
+                edge_visits[edge.child] += edge.number_visits
+                parents[edge.child] += 1
+    shared = [node for node, count in parents.items() if count > 1]
+    assert sum(node.number_visits for node in shared) > 100
+    # a shared node's statistics gather the playouts of all of its parents
+    assert all(node.number_visits == edge_visits[node] for node in parents)
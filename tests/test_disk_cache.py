@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip('lcztools')
+
+from search.disk_cache import DiskCache, MAX_MOVES, SLOT, weights_digest, encode_move, decode_move
+
+RESULT = OrderedDict([('e2e4', 0.5), ('a7a8q', 0.25), ('g1f3', 0.25)]), -0.5
+
+
+def test_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'), digest=1, size_mb=1)
+    assert cache.get(42) is None
+    cache.put(42, RESULT)
+    policy, value = cache.get(42)
+    assert list(policy.items()) == list(RESULT[0].items())
+    assert value == RESULT[1]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'stores': 1}
+
+
+def test_entries_outlive_the_process_and_are_keyed_by_network(tmp_path):
+    path = str(tmp_path / 'cache')
+    cache = DiskCache(path, digest=1, size_mb=1)
+    cache.put(42, RESULT)
+    cache.flush()
+    del cache
+
+    assert DiskCache(path, digest=1).get(42) == RESULT
+    assert DiskCache(path, digest=2).get(42) is None
+
+
+def test_colliding_keys_probe_further(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'), digest=1, size_mb=1)
+    starts = {}
+    for key in range(100000):
+        start = cache.slot_key(key) % len(cache.table)
+        if start in starts:
+            first, second = starts[start], key
+            break
+        starts[start] = key
+    other = RESULT[0], 0.25
+    cache.put(first, RESULT)
+    cache.put(second, other)
+    assert cache.get(first) == RESULT
+    assert cache.get(second) == other
+
+
+def test_torn_entries_are_misses(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'), digest=1, size_mb=1)
+    cache.put(42, RESULT)
+    slot = int(np.flatnonzero(cache.table['key'] == cache.slot_key(42))[0])
+    # another writer's key over this entry
+    cache.table['key'][slot] = cache.slot_key(43)
+    assert cache.get(43) is None
+    # another writer's priors in this entry
+    cache.table['key'][slot] = cache.slot_key(42)
+    assert cache.get(42) == RESULT
+    cache.table['priors'][slot][0] = 0.125
+    assert cache.get(42) is None
+
+
+def test_file_of_another_layout_is_replaced(tmp_path):
+    path = tmp_path / 'cache'
+    path.write_bytes(b'\1' * (SLOT.itemsize * 10 + 1))
+    cache = DiskCache(str(path), digest=1, size_mb=1)
+    assert cache.get(42) is None
+    cache.put(42, RESULT)
+    assert cache.get(42) == RESULT
+
+
+def test_wide_policies_are_not_stored(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'), digest=1, size_mb=1)
+    cache.put(42, ({str(i): 1. for i in range(MAX_MOVES + 1)}, 0.))
+    assert cache.get(42) is None
+
+
+def test_move_encoding():
+    for move in ('e2e4', 'a7a8q', 'h2h1n', 'e1g1'):
+        assert decode_move(encode_move(move)) == move
+
+
+def test_weights_digest(tmp_path):
+    one, other = tmp_path / 'one', tmp_path / 'other'
+    one.write_bytes(b'weights')
+    other.write_bytes(b'weights2')
+    assert weights_digest(str(one)) == weights_digest(str(one))
+    assert weights_digest(str(one)) != weights_digest(str(other))
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+pytest.importorskip('lcztools')
+
+from match import MatchScore, elo_difference, expected_score, first_engine_score
+
+
+def score(wins, draws, losses, **kwargs):
+    match = MatchScore(**kwargs)
+    for result, games in ((1., wins), (0.5, draws), (0., losses)):
+        for _ in range(games):
+            match.add(result)
+    return match
+
+
+def test_elo_conversions():
+    assert expected_score(0.) == 0.5
+    assert expected_score(400.) == pytest.approx(10. / 11.)
+    for elo in (-300., -20., 0., 35., 500.):
+        assert elo_difference(expected_score(elo)) == pytest.approx(elo)
+
+
+def test_elo_and_error():
+    match = score(60, 30, 10)
+    elo, error = match.elo()
+    assert elo == pytest.approx(-400. * math.log10(1. / 0.75 - 1.))
+    # the variance of a game's score around the mean of 0.75
+    variance = (60 * 0.25 ** 2 + 30 * 0.25 ** 2 + 10 * 0.75 ** 2) / 100
+    margin = 1.96 * math.sqrt(variance / 100)
+    assert error == pytest.approx((elo_difference(0.75 + margin) - elo_difference(0.75 - margin)) / 2)
+
+
+def test_llr_is_the_normal_log_likelihood_ratio():
+    match = score(130, 250, 120, elo0=0., elo1=5.)
+    games = match.games()
+    mean, variance = match.score_and_variance()
+    s0, s1 = expected_score(0.), expected_score(5.)
+    # log of the ratio of the normal densities of the mean score under elo1 and under elo0
+    expected = ((mean - s0) ** 2 - (mean - s1) ** 2) / (2. * variance / games)
+    assert match.llr() == pytest.approx(expected)
+
+
+def test_sprt_bounds_and_decisions():
+    match = MatchScore(alpha=0.05, beta=0.05)
+    assert match.lower == pytest.approx(math.log(0.05 / 0.95))
+    assert match.upper == pytest.approx(math.log(0.95 / 0.05))
+    assert match.llr() == 0. and match.decision() is None
+    assert score(5, 5, 5).decision() is None
+    assert score(3000, 4000, 2000).decision() == 'H1'
+    assert score(2000, 4000, 3000).decision() == 'H0'
+    assert score(0, 10, 0).llr() == 0.  # no variance, no evidence
+
+
+def test_first_engine_score():
+    # the first engine has white in odd games
+    assert first_engine_score(1, '1-0') == 1.
+    assert first_engine_score(2, '1-0') == 0.
+    assert first_engine_score(2, '0-1') == 1.
+    assert first_engine_score(3, '1/2-1/2') == 0.5
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip('lcztools')
+
+import search
+from search.terminal import LeafEvaluator, position_value
+from bench_util import HashNet
+from conftest import board
+
+# black mates with d8h4
+FOOLS_MATE = ('f2f3', 'e7e5', 'g2g4')
+
+
+def test_position_value():
+    assert position_value(board()) is None
+    assert position_value(board(*FOOLS_MATE, 'd8h4')) == -1.
+    assert position_value(board(fen='7k/5Q2/6K1/8/8/8/8/8 b - -')) == 0.  # stalemate
+    assert position_value(board(fen='8/8/4k3/8/8/4K3/4N3/8 w - -')) == 0.  # insufficient material
+
+
+def test_terminal_leaves_are_flagged_and_not_evaluated_again():
+    net = search.NeuralNet(net=HashNet())
+    evaluate = LeafEvaluator(net)
+    root = search.UCTNode(board=board(*FOOLS_MATE))
+    root.expand(evaluate(root)[0])
+    mate = root.children['d8h4']
+    mate.board = board(*FOOLS_MATE, 'd8h4')
+    assert mate.terminal is None
+    assert evaluate(mate) == ({}, -1.)
+    assert mate.terminal == -1.
+
+    evaluations = net.evaluations
+    assert evaluate(mate) == ({}, -1.)
+    assert evaluate.batch([mate, mate]) == [({}, -1.)] * 2
+    assert net.evaluations == evaluations
+
+
+@pytest.mark.parametrize('nodeclass', [search.UCTNode, search.DAGNode])
+def test_terminal_flags_survive_tree_reuse(nodeclass):
+    net = search.NeuralNet(net=HashNet())
+    root = nodeclass(board=board(*FOOLS_MATE))
+    search.mcts_search(nodeclass, None, 300, net=net, root=root)
+    assert root.children['d8h4'].terminal == -1.
+    evaluations = net.evaluations
+    search.mcts_search(nodeclass, None, 300, net=net, root=root)
+    # the mate takes most of the playouts, none of which reach the network
+    assert net.evaluations - evaluations < 100
+    assert root.children['d8h4'].terminal == -1.
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('lcztools')
+
+from search.time_manager import TimeManager, MIN_BUDGET, UNLIMITED, out_of_time, remaining_reads
+
+
+def test_movetime_less_overhead():
+    manager = TimeManager(move_overhead=0.1)
+    assert manager.budget({'movetime': 1000, 'wtime': 5000}, True) == pytest.approx(0.9)
+    assert manager.budget({'movetime': 50}, True) == MIN_BUDGET
+
+
+def test_share_of_the_clock():
+    manager = TimeManager(move_overhead=0.1, moves_to_go=30)
+    limits = {'wtime': 60000, 'btime': 30000, 'winc': 1000, 'binc': 0}
+    # the overhead is kept back from the clock
+    assert manager.budget(limits, True) == pytest.approx((59900 / 30 + 750) / 1000)
+    assert manager.budget(limits, False) == pytest.approx(29900 / 30 / 1000)
+    # movestogo only shortens the horizon
+    assert manager.budget(dict(limits, movestogo=10), True) == pytest.approx((5990 + 750) / 1000)
+    assert manager.budget(dict(limits, movestogo=100), True) == manager.budget(limits, True)
+
+
+def test_short_clock():
+    manager = TimeManager(move_overhead=0.1)
+    assert manager.budget({'wtime': 3000}, True) == pytest.approx(2900 / 30 / 1000)
+    assert manager.budget({'wtime': 50}, True) == MIN_BUDGET
+
+
+def test_never_more_than_half_the_clock():
+    manager = TimeManager(move_overhead=0.)
+    # the increment would take more than half of the clock
+    assert manager.budget({'wtime': 1000, 'winc': 4000, 'movestogo': 10}, True) == pytest.approx(0.5)
+    # except on the last move before the time control
+    assert manager.budget({'wtime': 1000, 'winc': 4000, 'movestogo': 1}, True) == pytest.approx(1.)
+
+
+def test_search_limits():
+    manager = TimeManager(move_overhead=0.1)
+    assert manager.search_limits({}, True, 800) == (800, None)
+    assert manager.search_limits({'nodes': 100}, True, 800) == (100, None)
+    assert manager.search_limits({'infinite': True, 'wtime': 1000}, True, 800) == (UNLIMITED, None)
+
+    start = time.time()
+    reads, deadline = manager.search_limits({'movetime': 2000}, True, 800)
+    assert reads == UNLIMITED
+    assert start + 1.9 <= deadline <= time.time() + 1.9
+    reads, deadline = manager.search_limits({'movetime': 2000, 'nodes': 100}, True, 800)
+    assert reads == 100 and deadline is not None
+
+
+def test_out_of_time():
+    now = time.time()
+    stop = threading.Event()
+    assert not out_of_time(now - 1., now - 10., 0, stop=stop)  # a search gets one playout
+    assert not out_of_time(None, now - 10., 100, stop=stop)
+    assert out_of_time(now - 1., now - 10., 100)
+    # 100 playouts took a second, the next batch of 100 would take another
+    assert out_of_time(now + 0.5, now - 1., 100, next_reads=100)
+    assert not out_of_time(now + 5., now - 1., 100, next_reads=100)
+    stop.set()
+    assert out_of_time(None, now, 1, stop=stop)
+
+
+def test_remaining_reads():
+    now = time.time()
+    assert remaining_reads(800, 100, now, None) == 700
+    # 100 playouts a second, with about two seconds left
+    assert remaining_reads(UNLIMITED, 100, now - 1., now + 2.) == pytest.approx(200, rel=0.05)
+    assert remaining_reads(150, 100, now - 1., now + 2.) == 50
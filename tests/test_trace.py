@@ -0,0 +1,77 @@
+import os
+from collections import OrderedDict
+
+import pytest
+
+lcztools = pytest.importorskip('lcztools')
+
+import search
+from search.cache import position_hash
+from search.trace import RecordingNet, ReplayNet, is_trace, read_trace, MAGIC
+from bench_util import HashNet
+
+
+class FixedNet:
+    def evaluate(self, board):
+        return OrderedDict([('e2e4', 0.5), ('d2d4', 0.25), ('g1f3', 0.25)]), 0.75
+
+
+def boards():
+    board = lcztools.LeelaBoard()
+    yield board
+    for move in ('e2e4', 'e7e5', 'g1f3'):
+        board = board.copy()
+        board.push_uci(move)
+        yield board
+
+
+def test_replay_returns_the_recorded_evaluations(tmp_path):
+    path = str(tmp_path / 'trace')
+    net = HashNet()  # priors that need 64 bit floats
+    recording = RecordingNet(net, path)
+    positions = list(boards())
+    recorded = recording.evaluate_batch(positions)
+    assert is_trace(path)
+
+    replay = ReplayNet(path)
+    for board, (policy, value) in zip(positions, recorded):
+        replayed_policy, replayed_value = replay.evaluate(board)
+        assert list(replayed_policy.items()) == list(policy.items())
+        assert replayed_value == value
+        assert replayed_value == net.evaluate(board)[1]
+
+    with pytest.raises(KeyError):
+        replay.evaluate(lcztools.LeelaBoard(fen='8/8/4k3/8/8/4K3/4P3/8 w - -'))
+
+
+def test_narrow_priors_and_no_duplicates(tmp_path):
+    path = str(tmp_path / 'trace')
+    board = lcztools.LeelaBoard()
+    RecordingNet(FixedNet(), path).evaluate(board)
+    size = os.path.getsize(path)
+    # a second recorder of the same trace doesn't add the position again
+    RecordingNet(FixedNet(), path).evaluate(board)
+    assert os.path.getsize(path) == size
+    assert read_trace(path) == {position_hash(board): FixedNet().evaluate(board)}
+
+
+def test_replayed_search_matches_the_recorded_one(tmp_path):
+    path = str(tmp_path / 'trace')
+    recorded = search.engines['uct'](lcztools.LeelaBoard(), 200,
+                                     net=search.NeuralNet(net=RecordingNet(HashNet(), path)))
+    replayed = search.engines['uct'](lcztools.LeelaBoard(), 200,
+                                     net=search.NeuralNet(net=ReplayNet(path)))
+    assert recorded[0] == replayed[0]
+    assert recorded[1].number_visits == replayed[1].number_visits
+    assert recorded[1].Q() == replayed[1].Q()
+
+
+def test_is_trace(tmp_path):
+    other = tmp_path / 'weights'
+    other.write_bytes(b'not a trace')
+    assert not is_trace(str(other))
+    assert not is_trace(str(tmp_path / 'missing'))
+    with pytest.raises(ValueError):
+        RecordingNet(FixedNet(), str(other))
+    other.write_bytes(MAGIC)
+    assert is_trace(str(other))